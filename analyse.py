@@ -1,4 +1,6 @@
 import os
+import argparse
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
 from scipy.stats import norm
 import numpy as np
@@ -21,14 +23,15 @@ def calculate_signal_detection_metrics(hit_rate, false_alarm_rate):
 
     return d_prime, beta
 
-# Updated function to analyze data and generate report with signal detection theory metrics
-def analyze_and_generate_report_sdt(csv_file_path, report_file_path):
-    # Load the CSV file and skip the first 2 rows (metadata)
-    try:
-        data = pd.read_csv(csv_file_path, skiprows=2)
-    except Exception as e:
-        return f"Error reading {csv_file_path}: {str(e)}"
-    
+def compute_sdt_metrics(data):
+    """
+    Compute the signal detection and accuracy metrics for one participant.
+
+    Parameters:
+    data: DataFrame of the participant's trials (a csv_data file read with skiprows=2).
+
+    Returns a dictionary of counts, rates (percentages where the report shows them) and d'/Beta.
+    """
     # Calculate hits and false alarms
     actual_change_trials = data[data['trial_direction'] != 'NIL']
     no_change_trials = data[data['trial_direction'] == 'NIL']
@@ -59,55 +62,158 @@ def analyze_and_generate_report_sdt(csv_file_path, report_file_path):
     direction_accuracy_rate_corrected = len(direction_accuracy_corrected) / len(actual_change_trials) * 100 if len(actual_change_trials) > 0 else 0
     speed_accuracy_rate_corrected = len(speed_accuracy_corrected) / len(actual_change_trials) * 100 if len(actual_change_trials) > 0 else 0
 
-    # Generate report content with SDT metrics
-    report_content = f"""
+    return {
+        'trials': len(data),
+        'hits': int(hits),
+        'misses': int(misses),
+        'false_alarms': int(false_alarms),
+        'correct_rejections': int(correct_rejections),
+        'hit_rate': float(hit_rate),
+        'false_alarm_rate': float(false_alarm_rate),
+        'd_prime': float(d_prime),
+        'beta': float(beta),
+        'correct_detection_rate': correct_detection_rate,
+        'false_positive_rate': false_positive_rate,
+        'direction_bias_left': float(direction_bias_corrected.get('left', 0)),
+        'direction_bias_right': float(direction_bias_corrected.get('right', 0)),
+        'speed_influence_fast': float(speed_influence_corrected.get('fast', 0)),
+        'speed_influence_slow': float(speed_influence_corrected.get('slow', 0)),
+        'direction_accuracy_rate': direction_accuracy_rate_corrected,
+        'speed_accuracy_rate': speed_accuracy_rate_corrected,
+    }
+
+def format_report_sdt(csv_file_path, metrics):
+    """
+    Format one participant's metrics as the text report.
+    """
+    return f"""
     Report for {os.path.basename(csv_file_path)}:
     ------------------------------------------
-    Correct Change Detection Rate: {correct_detection_rate:.2f}%
-    False Positive Rate: {false_positive_rate:.2f}%
+    Correct Change Detection Rate: {metrics['correct_detection_rate']:.2f}%
+    False Positive Rate: {metrics['false_positive_rate']:.2f}%
 
     Signal Detection Theory Metrics:
-    d' (Sensitivity): {d_prime:.2f}
-    Beta (Response Bias): {beta:.2f}
+    d' (Sensitivity): {metrics['d_prime']:.2f}
+    Beta (Response Bias): {metrics['beta']:.2f}
 
     Direction Bias:
-    Left: {direction_bias_corrected.get('left', 0):.2f}%
-    Right: {direction_bias_corrected.get('right', 0):.2f}%
+    Left: {metrics['direction_bias_left']:.2f}%
+    Right: {metrics['direction_bias_right']:.2f}%
 
     Speed Influence:
-    Fast: {speed_influence_corrected.get('fast', 0):.2f}%
-    Slow: {speed_influence_corrected.get('slow', 0):.2f}%
+    Fast: {metrics['speed_influence_fast']:.2f}%
+    Slow: {metrics['speed_influence_slow']:.2f}%
 
-    Direction Accuracy Rate: {direction_accuracy_rate_corrected:.2f}%
-    Speed Accuracy Rate: {speed_accuracy_rate_corrected:.2f}%
+    Direction Accuracy Rate: {metrics['direction_accuracy_rate']:.2f}%
+    Speed Accuracy Rate: {metrics['speed_accuracy_rate']:.2f}%
     """
 
-    # Write report to file
-    with open(report_file_path, 'w') as report_file:
-        report_file.write(report_content)
+# Updated function to analyze data and generate report with signal detection theory metrics
+def analyze_and_generate_report_sdt(csv_file_path, report_file_path):
+    result, _ = analyze_file((csv_file_path, report_file_path))
+    return result
 
-    return f"Report generated for {csv_file_path}"
+def analyze_file(job):
+    """
+    Analyze one participant's CSV and write its text report. Runs in a worker process.
+    Returns (status message, metrics dictionary or None on error).
+    """
+    csv_file_path, report_file_path = job
+
+    # Load the CSV file and skip the first 2 rows (metadata)
+    try:
+        data = pd.read_csv(csv_file_path, skiprows=2)
+    except Exception as e:
+        return f"Error reading {csv_file_path}: {str(e)}", None
+
+    # A malformed session fails on its own instead of aborting the whole folder
+    try:
+        metrics = compute_sdt_metrics(data)
+
+        # Write report to file
+        with open(report_file_path, 'w') as report_file:
+            report_file.write(format_report_sdt(csv_file_path, metrics))
+    except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+        return f"Error analysing {csv_file_path}: {type(e).__name__}: {e}", None
+
+    return f"Report generated for {csv_file_path}", {'participant': os.path.splitext(os.path.basename(csv_file_path))[0], **metrics}
+
+def group_summary(results):
+    """
+    Summarise the per-participant results table across the group in one vectorized pass.
+
+    Returns a DataFrame with one row per statistic (mean, std, sem, median, min, max over
+    participants, and 'pooled': rates and d'/Beta recomputed from the summed counts) and
+    one column per metric.
+    """
+    metrics = results.drop(columns='participant')
+    summary = metrics.agg(['mean', 'std', 'sem', 'median', 'min', 'max'])
+
+    # Pool the trial counts of all participants, then derive the rates and SDT metrics from them
+    totals = metrics[['trials', 'hits', 'misses', 'false_alarms', 'correct_rejections']].sum()
+    pooled = pd.Series(np.nan, index=metrics.columns)
+    pooled[totals.index] = totals
+    signal_trials = totals['hits'] + totals['misses']
+    noise_trials = totals['false_alarms'] + totals['correct_rejections']
+    pooled['hit_rate'] = totals['hits'] / signal_trials if signal_trials > 0 else 0
+    pooled['false_alarm_rate'] = totals['false_alarms'] / noise_trials if noise_trials > 0 else 0
+    pooled['d_prime'], pooled['beta'] = calculate_signal_detection_metrics(pooled['hit_rate'], pooled['false_alarm_rate'])
+    pooled['correct_detection_rate'] = pooled['hit_rate'] * 100
+    pooled['false_positive_rate'] = pooled['false_alarm_rate'] * 100
+    summary.loc['pooled'] = pooled
+    summary.index.name = 'statistic'
+    return summary
 
 # Main function to process all CSVs in a folder and generate reports
-def process_folder_sdt(csv_folder, reports_folder):
+def process_folder_sdt(csv_folder, reports_folder, workers=None):
+    """
+    Write a text report per participant, plus sdt_results.csv (one row of metrics per
+    participant) and sdt_group_summary.csv (group statistics) in reports_folder.
+
+    Parameters:
+    csv_folder: Folder of csv_data files.
+    reports_folder: Output folder.
+    workers: Number of worker processes (defaults to the number of CPUs; 1 runs in-process).
+
+    Returns the per-participant results as a DataFrame.
+    """
     # Check if reports folder exists, if not, create it
     if not os.path.exists(reports_folder):
         os.makedirs(reports_folder)
 
-    # Process each CSV file in the csv_folder
-    for csv_file in os.listdir(csv_folder):
-        if csv_file.endswith('.csv'):
-            csv_file_path = os.path.join(csv_folder, csv_file)
-            report_file_path = os.path.join(reports_folder, f"{os.path.splitext(csv_file)[0]}_report.txt")
-
-            # Analyze and generate report for each CSV
-            result = analyze_and_generate_report_sdt(csv_file_path, report_file_path)
-            print(result)
+    jobs = [
+        (os.path.join(csv_folder, csv_file), os.path.join(reports_folder, f"{os.path.splitext(csv_file)[0]}_report.txt"))
+        for csv_file in sorted(os.listdir(csv_folder))
+        if csv_file.endswith('.csv')
+    ]
+
+    # Analyze and generate report for each CSV, across a process pool
+    if workers == 1 or len(jobs) <= 1:
+        outcomes = [analyze_file(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            outcomes = list(executor.map(analyze_file, jobs))
+
+    rows = []
+    for result, metrics in outcomes:
+        print(result)
+        if metrics is not None:
+            rows.append(metrics)
+
+    results = pd.DataFrame(rows)
+    if len(results):
+        results.to_csv(os.path.join(reports_folder, 'sdt_results.csv'), index=False)
+        group_summary(results).to_csv(os.path.join(reports_folder, 'sdt_group_summary.csv'))
+    return results
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Signal detection analysis of every participant, with a group summary.')
+    parser.add_argument('--workers', type=int, default=None, help='Number of worker processes (default: all CPUs)')
+    args = parser.parse_args()
+
     # Specify the directory paths
     csv_folder = os.path.join(os.getcwd(), 'csv_data')
     reports_folder = os.path.join(os.getcwd(), 'reports')
 
     # Process the folder of CSV files
-    process_folder_sdt(csv_folder, reports_folder)
\ No newline at end of file
+    process_folder_sdt(csv_folder, reports_folder, workers=args.workers)
@@ -0,0 +1,345 @@
+import os
+import atexit
+import itertools
+import threading
+import multiprocessing
+from multiprocessing import shared_memory
+import numpy as np
+from sound import AudioEngine, BufferSource, SoundGenerator, PlaybackHandle, backends, get_engine
+
+# Layout of the shared status block (int64), written by the audio process
+STATUS_CURRENT_ID = 0  # Id of the stimulus being played, 0 if none
+STATUS_POSITION = 1  # Frames of that stimulus played so far
+STATUS_CALLBACKS = 2  # Audio callbacks run since start, as a heartbeat
+STATUS_SIZE = 3
+
+# Layout of the shared live parameter block (float64), written by the GUI process.
+# The version is odd while a write is in progress (a seqlock), so the reader can tell
+# a torn snapshot from a complete one.
+PARAM_VERSION = 0
+PARAM_FREQUENCY = 1
+PARAM_LEFT_AMP = 2
+PARAM_RIGHT_AMP = 3
+PARAM_PHASE_DIFF = 4
+PARAM_SIZE = 5
+
+
+def _attach(name):
+    # Attach to a block created by the GUI process, which owns it and unlinks it
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13 has no track argument. The spawned audio process shares the GUI
+        # process's resource tracker, where the block is already registered.
+        return shared_memory.SharedMemory(name=name)
+
+
+class _ReportingSource(BufferSource):
+    """
+    A BufferSource that publishes its id and position to the shared status block as it plays.
+    """
+    def __init__(self, buffer, sample_rate, stimulus_id, status):
+        super().__init__(buffer, sample_rate)
+        self.stimulus_id = stimulus_id
+        self.status = status
+
+    def render_into(self, out):
+        super().render_into(out)
+        self.status[STATUS_CURRENT_ID] = self.stimulus_id
+        self.status[STATUS_POSITION] = self.position
+
+
+class _SharedParamsGenerator(SoundGenerator):
+    """
+    A SoundGenerator that picks up live parameters from the shared parameter block once per
+    block and reports its position to the shared status block.
+    """
+    def __init__(self, sample_rate, params, stimulus_id, status):
+        super().__init__(sample_rate)
+        self.params = params
+        self.params_version = 0
+        self.stimulus_id = stimulus_id
+        self.status = status
+
+    def render_into(self, out):
+        version = self.params[PARAM_VERSION]
+        if version != self.params_version and version % 2 == 0:
+            frequency, left_amp, right_amp, phase_diff = self.params[PARAM_FREQUENCY:PARAM_SIZE]
+            if self.params[PARAM_VERSION] == version:
+                self.params_version = version
+                self.publish(frequency, left_amp, right_amp, phase_diff)
+        super().render_into(out)
+        self.status[STATUS_CURRENT_ID] = self.stimulus_id
+        self.status[STATUS_POSITION] = self.position
+
+
+class _HeartbeatEngine(AudioEngine):
+    """
+    An AudioEngine that counts its callbacks in the shared status block.
+    """
+    def __init__(self, sample_rate, blocksize, backend, status):
+        super().__init__(sample_rate, blocksize, backend)
+        self.status = status
+
+    def fill(self, outdata, frames, time=None):
+        super().fill(outdata, frames, time)
+        self.status[STATUS_CALLBACKS] += 1
+
+
+def _engine_main(commands, events, status_name, params_name, sample_rate, blocksize, backend_name):
+    """
+    Entry point of the audio process: owns the output stream and executes commands from the GUI process.
+    """
+    status_shm = _attach(status_name)
+    params_shm = _attach(params_name)
+    status = np.ndarray((STATUS_SIZE,), dtype=np.int64, buffer=status_shm.buf)
+    params = np.ndarray((PARAM_SIZE,), dtype=np.float64, buffer=params_shm.buf)
+
+    engine = _HeartbeatEngine(sample_rate, blocksize, backends[backend_name](), status)
+    engine.start()
+    handles = {}
+
+    def report_done(stimulus_id, shm):
+        def on_done(handle):
+            handles.pop(stimulus_id, None)
+            # perf_counter_ns is system-wide, so the onset means the same in the GUI process
+            events.put(('done', stimulus_id, (handle.audio_stats, handle.onset_ns)))
+            if shm is not None:
+                shm.close()
+        return on_done
+
+    while True:
+        command = commands.get()
+        kind = command[0]
+        if kind == 'play':
+            _, stimulus_id, buffer_name, frames = command
+            shm = _attach(buffer_name)
+            buffer = np.ndarray((frames, 2), dtype=np.float32, buffer=shm.buf)
+            handle = engine.play(_ReportingSource(buffer, sample_rate, stimulus_id, status))
+            handles[stimulus_id] = handle
+            handle.add_done_callback(report_done(stimulus_id, shm))
+        elif kind == 'tone':
+            _, stimulus_id = command
+            handle = engine.play(_SharedParamsGenerator(sample_rate, params, stimulus_id, status))
+            handles[stimulus_id] = handle
+            handle.add_done_callback(report_done(stimulus_id, None))
+        elif kind == 'cancel':
+            handle = handles.get(command[1])
+            if handle is not None:
+                handle.cancel()
+        elif kind == 'status':
+            events.put(('status', command[1], {
+                'queued': len(engine.queue),
+                'playing': engine.current is not None,
+                'frame': engine.frame,
+                'audio': engine.stats.summary(),
+            }))
+        elif kind == 'shutdown':
+            engine.close()
+            break
+
+    del status, params
+    status_shm.close()
+    params_shm.close()
+
+
+class _RemoteSource:
+    """
+    Stand-in for a source playing in the audio process, so a PlaybackHandle can track it.
+    """
+    def __init__(self, stimulus_id, total_frames, sample_rate, status):
+        self.stimulus_id = stimulus_id
+        self.total_frames = total_frames
+        self.sample_rate = sample_rate
+        self.status = status
+        self.finished_event = threading.Event()
+        self.audio_stats = None
+        self.onset_ns = None
+
+    @property
+    def position(self):
+        if self.status[STATUS_CURRENT_ID] == self.stimulus_id:
+            return int(self.status[STATUS_POSITION])
+        if self.finished_event.is_set() and self.total_frames is not None:
+            return self.total_frames
+        return 0
+
+
+class ProcessPlaybackHandle(PlaybackHandle):
+    """
+    A PlaybackHandle for a sound playing in the audio process.
+    """
+    def __init__(self, source, engine):
+        self.engine = engine
+        super().__init__(source, stop=self._on_done)
+
+    def _on_done(self):
+        if self.cancelled:
+            self.engine._send(('cancel', self.sound_gen.stimulus_id))
+        self.audio_stats = self.sound_gen.audio_stats
+
+
+class ProcessAudioEngine:
+    """
+    Runs the audio output in a dedicated subprocess so the GUI process (its GIL, garbage
+    collector and widget work) can never hold up the audio callback.
+
+    Stimulus buffers are passed through multiprocessing.shared_memory, live tone parameters
+    through a shared parameter block, and control goes through a small command queue
+    (play, tone, cancel, status, shutdown). play() returns PlaybackHandles like AudioEngine.
+    """
+    def __init__(self, sample_rate=44100, blocksize=1024, backend_name=None):
+        if backend_name is None:
+            backend_name = os.environ.get('PSYCHO_AUDIO_BACKEND', 'sounddevice')
+        self.sample_rate = sample_rate
+        self.blocksize = blocksize
+
+        self.status_shm = shared_memory.SharedMemory(create=True, size=STATUS_SIZE * 8)
+        self.params_shm = shared_memory.SharedMemory(create=True, size=PARAM_SIZE * 8)
+        self.status_block = np.ndarray((STATUS_SIZE,), dtype=np.int64, buffer=self.status_shm.buf)
+        self.params = np.ndarray((PARAM_SIZE,), dtype=np.float64, buffer=self.params_shm.buf)
+        self.status_block[:] = 0
+        self.params[:] = 0
+
+        # Spawn rather than fork: forking a process that runs Qt threads is unsafe
+        context = multiprocessing.get_context('spawn')
+        self.commands = context.Queue()
+        self.events = context.Queue()
+        self.process = context.Process(
+            target=_engine_main,
+            args=(self.commands, self.events, self.status_shm.name, self.params_shm.name, sample_rate, blocksize, backend_name),
+            daemon=True,
+        )
+        self.process.start()
+
+        self._ids = itertools.count(1)
+        self._sources = {}  # stimulus id -> (_RemoteSource, shared buffer or None)
+        self._status_replies = {}
+        self._lock = threading.Lock()
+        self._listener = threading.Thread(target=self._listen, daemon=True)
+        self._listener.start()
+
+    def _send(self, command):
+        self.commands.put(command)
+
+    def _listen(self):
+        # Dispatch events from the audio process
+        while True:
+            event = self.events.get()
+            if event is None:
+                break
+            kind, stimulus_id, payload = event
+            if kind == 'done':
+                with self._lock:
+                    source, shm = self._sources.pop(stimulus_id, (None, None))
+                if shm is not None:
+                    shm.close()
+                    shm.unlink()
+                if source is not None:
+                    source.audio_stats, source.onset_ns = payload
+                    source.finished_event.set()
+            elif kind == 'status':
+                with self._lock:
+                    reply = self._status_replies.get(stimulus_id)
+                if reply is not None:
+                    reply[1] = payload
+                    reply[0].set()
+
+    def play(self, source, automation=None, start_frame=None):
+        """
+        Copy a pre-rendered BufferSource into shared memory and queue it in the audio process.
+        Returns a PlaybackHandle.
+        """
+        if not isinstance(source, BufferSource) or automation is not None or start_frame is not None:
+            raise ValueError("The audio process only plays pre-rendered buffers")
+        buffer = np.ascontiguousarray(source.buffer, dtype=np.float32)
+        shm = shared_memory.SharedMemory(create=True, size=max(buffer.nbytes, 1))
+        np.ndarray(buffer.shape, dtype=np.float32, buffer=shm.buf)[:] = buffer
+
+        stimulus_id = next(self._ids)
+        remote = _RemoteSource(stimulus_id, len(buffer), self.sample_rate, self.status_block)
+        with self._lock:
+            self._sources[stimulus_id] = (remote, shm)
+        self._send(('play', stimulus_id, shm.name, len(buffer)))
+        return ProcessPlaybackHandle(remote, self)
+
+    def start_tone(self, frequency, left_amp, right_amp, phase_diff):
+        """
+        Start a continuous tone in the audio process. Change it with publish() and stop it
+        by cancelling the returned PlaybackHandle.
+        """
+        self.publish(frequency, left_amp, right_amp, phase_diff)
+        stimulus_id = next(self._ids)
+        remote = _RemoteSource(stimulus_id, None, self.sample_rate, self.status_block)
+        with self._lock:
+            self._sources[stimulus_id] = (remote, None)
+        self._send(('tone', stimulus_id))
+        return ProcessPlaybackHandle(remote, self)
+
+    def publish(self, frequency, left_amp, right_amp, phase_diff):
+        """
+        Write new live tone parameters to the shared parameter block.
+        """
+        version = self.params[PARAM_VERSION]
+        self.params[PARAM_VERSION] = version + 1  # Odd: write in progress
+        self.params[PARAM_FREQUENCY:PARAM_SIZE] = (frequency, left_amp, right_amp, phase_diff)
+        self.params[PARAM_VERSION] = version + 2
+
+    def status(self, timeout=1.0):
+        """
+        Ask the audio process for its queue state and callback statistics.
+        Returns a dictionary, or None if it does not answer within timeout seconds.
+        """
+        request_id = next(self._ids)
+        reply = [threading.Event(), None]
+        with self._lock:
+            self._status_replies[request_id] = reply
+        self._send(('status', request_id))
+        reply[0].wait(timeout)
+        with self._lock:
+            self._status_replies.pop(request_id, None)
+        return reply[1]
+
+    def close(self):
+        """
+        Shut down the audio process and release the shared memory.
+        """
+        if self.process.is_alive():
+            self._send(('shutdown',))
+            self.process.join(timeout=5)
+        self.events.put(None)
+        with self._lock:
+            sources, self._sources = self._sources, {}
+        for source, shm in sources.values():
+            if shm is not None:
+                shm.close()
+                shm.unlink()
+            source.finished_event.set()
+        del self.status_block, self.params
+        for shm in (self.status_shm, self.params_shm):
+            shm.close()
+            shm.unlink()
+
+
+_process_engine = None
+_process_engine_lock = threading.Lock()
+
+def get_process_engine():
+    """
+    Return the ProcessAudioEngine shared by the whole process, starting it on first use.
+    """
+    global _process_engine
+    with _process_engine_lock:
+        if _process_engine is None:
+            _process_engine = ProcessAudioEngine()
+            atexit.register(_process_engine.close)
+        return _process_engine
+
+def get_playback_engine():
+    """
+    Return the engine stimuli should be played on: the out-of-process engine if the
+    PSYCHO_AUDIO_PROCESS environment variable is set to 1, otherwise the in-process one.
+    """
+    if os.environ.get('PSYCHO_AUDIO_PROCESS') == '1':
+        return get_process_engine()
+    return get_engine()
@@ -0,0 +1,169 @@
+import sys
+import json
+import platform
+import argparse
+from time import perf_counter
+import numpy as np
+import shift as sft
+from sound import SoundGenerator, AudioEngine, NullBackend, SineOscillator, WavetableOscillator
+
+block_sizes = [64, 128, 256, 512, 1024, 2048, 4096]
+sample_rates = [44100, 48000, 96000]
+
+# Oscillator backends compared on the 10 s phase shift stimulus, by name
+oscillators = {
+    'sine': SineOscillator,
+    'table4096_linear': lambda: WavetableOscillator(4096, 'linear'),
+    'table1024_cubic': lambda: WavetableOscillator(1024, 'cubic'),
+}
+
+
+def best_of(repeat, func):
+    """
+    Run func repeat times and return the shortest run time in seconds.
+    """
+    times = []
+    for _ in range(repeat):
+        start = perf_counter()
+        func()
+        times.append(perf_counter() - start)
+    return min(times)
+
+def bench_block_synthesis(block_size, sample_rate, audio_seconds=2.0, repeat=3):
+    """
+    Time generate_stereo_wave producing audio_seconds of sound in blocks of block_size.
+    """
+    blocks = max(1, int(audio_seconds * sample_rate / block_size))
+
+    def run():
+        sound_gen = SoundGenerator(sample_rate)
+        sound_gen.update_sound_properties(1000, 0.5, 0.5, 45)
+        for _ in range(blocks):
+            sound_gen.generate_stereo_wave(block_size)
+
+    seconds = best_of(repeat, run)
+    audio = blocks * block_size / sample_rate
+    return {
+        'name': f'block_synthesis/{block_size}@{sample_rate}',
+        'seconds': seconds,
+        'real_time_factor': seconds / audio,
+        'blocks_per_second': blocks / seconds,
+    }
+
+def bench_stimulus(mode, direction, shift, freq=1000, sample_rate=44100, repeat=3):
+    """
+    Time rendering a full 10 s shift stimulus offline.
+    """
+    seconds = best_of(repeat, lambda: sft.render_sound_shift(freq, mode, direction, shift, sample_rate))
+    return {
+        'name': f'stimulus/{mode}_{direction}_{shift}@{sample_rate}',
+        'seconds': seconds,
+        'real_time_factor': seconds / sft.full_time,
+    }
+
+def bench_oscillator(name, freq=1000, sample_rate=44100, repeat=3):
+    """
+    Time rendering the 10 s phase shift stimulus with one of the oscillator backends.
+    """
+    def run():
+        sound_gen, automation = sft.shift_stimulus(freq, 'phase', 'left', 'short', sample_rate)
+        sound_gen.oscillator = oscillators[name]()
+        sound_gen.render(automation)
+
+    seconds = best_of(repeat, run)
+    return {
+        'name': f'oscillator/{name}@{sample_rate}',
+        'seconds': seconds,
+        'real_time_factor': seconds / sft.full_time,
+    }
+
+def bench_callback_latency(block_size=1024, sample_rate=44100):
+    """
+    Drive AudioEngine.callback directly for a full phase shift stimulus and report the
+    mean and worst-case callback durations against the block deadline.
+    """
+    engine = AudioEngine(sample_rate, block_size, backend=NullBackend())
+    sound_gen, automation = sft.shift_stimulus(1000, 'phase', 'left', 'short', sample_rate)
+    sound_gen.load(automation)
+    engine.queue.append((sound_gen, None))
+
+    outdata = np.zeros((block_size, 2), dtype=np.float32)
+    while not sound_gen.finished_event.is_set():
+        engine.callback(outdata, block_size, None, None)
+
+    summary = engine.stats.summary()
+    return {
+        'name': f'callback/{block_size}@{sample_rate}',
+        'seconds': summary['max_callback_ms'] / 1000,
+        'mean_callback_ms': summary['mean_callback_ms'],
+        'max_callback_ms': summary['max_callback_ms'],
+        'deadline_ms': summary['deadline_ms'],
+        'late_callbacks': summary['late_callbacks'],
+    }
+
+def run_suite(repeat=3):
+    """
+    Run the whole benchmark suite and return the results as a dictionary.
+    """
+    results = []
+    for sample_rate in sample_rates:
+        for block_size in block_sizes:
+            results.append(bench_block_synthesis(block_size, sample_rate, repeat=repeat))
+    for mode in ('phase', 'volume'):
+        for shift in ('short', 'long'):
+            results.append(bench_stimulus(mode, 'left', shift, repeat=repeat))
+    for name in oscillators:
+        results.append(bench_oscillator(name, repeat=repeat))
+    for block_size in (256, 1024):
+        results.append(bench_callback_latency(block_size))
+
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'results': results,
+    }
+
+def compare(current, baseline, threshold):
+    """
+    Compare two suite results and return a list of (name, baseline_seconds, current_seconds, percent)
+    for every benchmark that got more than threshold percent slower.
+    """
+    baseline_seconds = {result['name']: result['seconds'] for result in baseline['results']}
+    regressions = []
+    for result in current['results']:
+        before = baseline_seconds.get(result['name'])
+        if not before:
+            continue
+        change = (result['seconds'] - before) / before * 100
+        if change > threshold:
+            regressions.append((result['name'], before, result['seconds'], change))
+    return regressions
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark sound synthesis against the real-time budget.')
+    parser.add_argument('--save', metavar='FILE', help='Save the results as a JSON baseline')
+    parser.add_argument('--compare', metavar='FILE', help='Compare against a saved JSON baseline')
+    parser.add_argument('--threshold', type=float, default=10.0, help='Percent slowdown that counts as a regression (default: 10)')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per benchmark; the fastest is kept')
+    args = parser.parse_args()
+
+    current = run_suite(args.repeat)
+    for result in current['results']:
+        extra = f"  rtf {result['real_time_factor']:.4f}" if 'real_time_factor' in result else f"  max {result['max_callback_ms']:.3f} ms / {result['deadline_ms']:.1f} ms"
+        print(f"{result['name']:<40} {result['seconds'] * 1000:10.3f} ms{extra}")
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(current, f, indent=4)
+        print(f"Saved baseline to {args.save}")
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)
+        regressions = compare(current, baseline, args.threshold)
+        for name, before, after, change in regressions:
+            print(f"REGRESSION {name}: {before * 1000:.3f} ms -> {after * 1000:.3f} ms (+{change:.1f}%)")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.threshold:.1f}%")
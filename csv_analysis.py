@@ -1,63 +1,166 @@
 import os
+import sys
+import argparse
 import pandas as pd
 
 # Directories
 input_folder = os.path.join(os.path.dirname(__file__), 'csv_data')
 output_folder = os.path.join(os.path.dirname(__file__), 'csv_ana')
 
-# Ensure output directory exists
-if not os.path.exists(output_folder):
-    os.makedirs(output_folder)
+
+def score_points(data):
+    """
+    Score one participant's trials per frequency, in a single grouped pass.
+
+    Within each frequency, every trial scores:
+    - 0 if there was no change (trial_direction 'NIL') but one was detected,
+    - 0.5 if there was a left/right change and it was detected,
+    - otherwise 3 if the frequency has both a left trial answered 'left' and a right
+      trial answered 'right', else 0.
+    Frequency totals below 1 count as 0.
+
+    Parameters:
+    data: DataFrame with frequency, trial_direction, change_detected and direction columns
+        (a csv_data file read with skiprows=2).
+
+    Returns a DataFrame with frequency and points columns.
+    """
+    trial_direction = data['trial_direction']
+    detected = data['change_detected'] == True
+    half = trial_direction.isin(['left', 'right']) & detected
+    other = ~half & ~((trial_direction == 'NIL') & detected)
+
+    per_trial = pd.DataFrame({
+        'frequency': data['frequency'],
+        'half': half,
+        'other': other,
+        'left_correct': (trial_direction == 'left') & (data['direction'] == 'left'),
+        'right_correct': (trial_direction == 'right') & (data['direction'] == 'right'),
+    })
+    groups = per_trial.groupby('frequency').agg(
+        half=('half', 'sum'),
+        other=('other', 'sum'),
+        left_correct=('left_correct', 'any'),
+        right_correct=('right_correct', 'any'),
+    )
+
+    both_correct = groups['left_correct'] & groups['right_correct']
+    points = 0.5 * groups['half'] + 3 * groups['other'] * both_correct
+    points = points.where(points >= 1, 0)
+
+    # Match the column type of the original per-row scoring: floats once any half point was
+    # scored and some total survives the threshold, integers otherwise
+    if not ((groups['half'] > 0).any() and (points >= 1).any()):
+        points = points.astype('int64')
+
+    return pd.DataFrame({'frequency': groups.index.to_numpy(), 'points': points.to_numpy()})
 
 # Function to process each CSV file
 def process_csv(file_path, output_path):
     # Load the CSV and skip the first two rows
     data = pd.read_csv(file_path, skiprows=2)
 
-    # Initialize a list to hold the points for each frequency
-    points_list = []
+    # Save the points per frequency to a new CSV file
+    score_points(data).to_csv(output_path, index=False)
 
-    # Group the data by frequency
-    grouped_data = data.groupby('frequency')
-
-    # Iterate over each frequency group
-    for freq, group in grouped_data:
+def legacy_score_points(data):
+    """
+    The original per-row scoring that score_points replaced, kept as the reference for verify().
+    """
+    points_list = []
+    for freq, group in data.groupby('frequency'):
         points = 0
-        
-        # Iterate over the rows in each frequency group
         for index, row in group.iterrows():
             trial_dir = row['trial_direction']
             change_detected = row['change_detected']
             direction = row['direction']
-
-            # Assign points based on conditions
             if trial_dir == 'NIL' and change_detected == True:
-                points += 0  # 0 points for this case
+                points += 0
             elif trial_dir in ['left', 'right'] and change_detected == True:
-                points += 0.5  # +0.5 points for this case
+                points += 0.5
             elif 'left' in group['trial_direction'].values and 'right' in group['trial_direction'].values:
                 left_dir = group[(group['trial_direction'] == 'left') & (group['direction'] == 'left')]
                 right_dir = group[(group['trial_direction'] == 'right') & (group['direction'] == 'right')]
                 if not left_dir.empty and not right_dir.empty:
-                    points += 3  # +3 points for this case
-
-        # Append the frequency and points to the list
+                    points += 3
         points_list.append({'frequency': freq, 'points': points})
-
-    # Create a DataFrame from the points list
     points_df = pd.DataFrame(points_list)
-
-    # Update points: any value below 1 should be converted to 0
     points_df['points'] = points_df['points'].apply(lambda x: 0 if x < 1 else x)
+    return points_df
+
+def random_session(rng, max_trials=60):
+    """
+    Generate a user_data session with random trials, including unanswered questions.
+    """
+    responses = []
+    for _ in range(rng.integers(1, max_trials + 1)):
+        response = {
+            'frequency': int(rng.choice([0, 50, 100, 150])),
+            'trial_sound': str(rng.choice(['constant', 'left_fast', 'left_slow', 'right_fast', 'right_slow'])),
+        }
+        answered = rng.integers(3)  # 0: nothing, 1: change question only, 2: all questions
+        if answered:
+            response['change_detected'] = bool(rng.integers(2))
+        if answered == 2:
+            response['direction'] = str(rng.choice(['left', 'right']))
+            response['speed'] = str(rng.choice(['fast', 'slow']))
+        responses.append(response)
+    return {'name': 'generated', 'responses': responses}
+
+def verify(input_folder=input_folder, sessions=200, seed=0):
+    """
+    Check that score_points writes exactly what the original per-row scoring writes, on every
+    file in input_folder and on randomly generated sessions (written with csv_generator, so
+    they are read back with the same column types as real files).
+
+    Returns the names of the files or generated sessions that differ.
+    """
+    import tempfile
+    import numpy as np
+    from csv_generator import write_csv
+
+    cases = [(file_name, os.path.join(input_folder, file_name)) for file_name in sorted(os.listdir(input_folder)) if file_name.endswith('.csv')]
+    mismatches = []
+    with tempfile.TemporaryDirectory() as temp_dir:
+        rng = np.random.default_rng(seed)
+        for index in range(sessions):
+            file_path = os.path.join(temp_dir, f'generated_{index}.csv')
+            write_csv(random_session(rng), file_path)
+            cases.append((f'generated session {index} (seed {seed})', file_path))
+
+        for name, file_path in cases:
+            data = pd.read_csv(file_path, skiprows=2)
+            if score_points(data).to_csv(index=False) != legacy_score_points(data).to_csv(index=False):
+                mismatches.append(name)
+    return mismatches
+
+def main(input_folder=input_folder, output_folder=output_folder):
+    # Ensure output directory exists
+    if not os.path.exists(output_folder):
+        os.makedirs(output_folder)
+
+    # Iterate over all files in the input folder
+    for file_name in os.listdir(input_folder):
+        if file_name.endswith('.csv'):
+            input_file_path = os.path.join(input_folder, file_name)
+            output_file_path = os.path.join(output_folder, file_name)  # Save with the same name
+            process_csv(input_file_path, output_file_path)
 
-    # Save the DataFrame to a new CSV file
-    points_df.to_csv(output_path, index=False)
+    print("Processing complete. CSV files have been saved in the 'csv_ana' folder.")
 
-# Iterate over all files in the input folder
-for file_name in os.listdir(input_folder):
-    if file_name.endswith('.csv'):
-        input_file_path = os.path.join(input_folder, file_name)
-        output_file_path = os.path.join(output_folder, file_name)  # Save with the same name
-        process_csv(input_file_path, output_file_path)
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Score each participant per frequency into csv_ana.')
+    parser.add_argument('--verify', action='store_true', help='Compare against the original per-row scoring instead of writing csv_ana')
+    parser.add_argument('--sessions', type=int, default=200, help='Number of generated sessions to check with --verify')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed for the generated sessions')
+    args = parser.parse_args()
 
-print("Processing complete. CSV files have been saved in the 'csv_ana' folder.")
\ No newline at end of file
+    if args.verify:
+        mismatches = verify(sessions=args.sessions, seed=args.seed)
+        for name in mismatches:
+            print(f"MISMATCH {name}")
+        if mismatches:
+            sys.exit(1)
+        print("score_points matches the original scoring on every file and generated session.")
+    else:
+        main()
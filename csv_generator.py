@@ -1,75 +1,188 @@
 import os
 import json
 import csv
+import hashlib
+import argparse
+from time import perf_counter
+from concurrent.futures import ProcessPoolExecutor
 
-def json_to_csv():
-    # Directories for raw data and csv output
-    raw_data_dir = os.path.join(os.path.dirname(__file__), 'raw_data')
-    csv_data_dir = os.path.join(os.path.dirname(__file__), 'csv_data')
+raw_data_dir = os.path.join(os.path.dirname(__file__), 'raw_data')
+csv_data_dir = os.path.join(os.path.dirname(__file__), 'csv_data')
+manifest_name = '.manifest.json'  # Source mtime, size and hash of every converted session
+
+
+def write_csv(data, csv_filepath):
+    """
+    Write one session as a CSV file: the user information rows, then one row per response.
+    The file is written to a temporary name and renamed, so it is never seen half-written.
+
+    Returns the number of response rows.
+    """
+    temp_path = f'{csv_filepath}.{os.getpid()}.tmp'
+    try:
+        with open(temp_path, 'w', newline='') as csv_file:
+            csv_writer = csv.writer(csv_file)
+
+            # Write user information once at the top, using "NIL" for missing data
+            user_info_headers = ['name', 'age', 'gender', 'email', 'phone']
+            user_info = [
+                data.get('name', 'NIL'),
+                data.get('age', 'NIL'),
+                data.get('gender', 'NIL'),
+                data.get('email', 'NIL') if data.get('email') else 'NIL',
+                data.get('phone', 'NIL') if data.get('phone') else 'NIL'
+            ]
+            csv_writer.writerow(user_info_headers)
+            csv_writer.writerow(user_info)
+
+            # Write usable data headers, now with trial_direction and trial_speed
+            data_headers = ['frequency', 'trial_direction', 'trial_speed', 'change_detected', 'direction', 'speed', 'start_time']
+            csv_writer.writerow(data_headers)
+
+            # Iterate through the responses and write usable data, using "NIL" for missing data
+            for response in data['responses']:
+                trial_sound = response.get('trial_sound', 'NIL')
+
+                # Default values for trial_direction and trial_speed
+                trial_direction = 'NIL'
+                trial_speed = 'NIL'
+
+                # Check if trial_sound is left/right and fast/slow, and split accordingly
+                if trial_sound != 'constant' and trial_sound != 'NIL':
+                    direction, speed = trial_sound.split('_')
+                    trial_direction = direction
+                    trial_speed = speed
+
+                # Write row with trial_direction and trial_speed
+                row = [
+                    response.get('frequency', 'NIL'),
+                    trial_direction,
+                    trial_speed,
+                    response.get('change_detected', 'NIL'),
+                    response.get('direction', 'NIL'),
+                    response.get('speed', 'NIL'),
+                    response.get('start_time', 'NIL')
+                ]
+                csv_writer.writerow(row)
+        os.replace(temp_path, csv_filepath)
+    except BaseException:
+        # Do not leave a half-written temporary file behind
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return len(data['responses'])
+
+def convert_one(job):
+    """
+    Convert one JSON session to CSV unless its content hash matches the manifest.
+    Runs in a worker process.
+
+    Returns (json_filename, status, manifest entry or error message, seconds), where status
+    is 'converted', 'skipped' (content unchanged) or 'failed'.
+    """
+    json_filename, json_filepath, csv_filepath, known_hash = job
+    start = perf_counter()
+    try:
+        stat = os.stat(json_filepath)
+        with open(json_filepath, 'rb') as json_file:
+            content = json_file.read()
+        entry = {
+            'mtime_ns': stat.st_mtime_ns,
+            'size': stat.st_size,
+            'sha256': hashlib.sha256(content).hexdigest(),
+            'csv': os.path.basename(csv_filepath),
+        }
+        # Touched but not changed: only the manifest entry needs refreshing
+        if entry['sha256'] == known_hash and os.path.exists(csv_filepath):
+            return json_filename, 'skipped', entry, perf_counter() - start
+        entry['rows'] = write_csv(json.loads(content), csv_filepath)
+        return json_filename, 'converted', entry, perf_counter() - start
+    except (OSError, ValueError, KeyError, TypeError, AttributeError) as error:
+        return json_filename, 'failed', f'{type(error).__name__}: {error}', perf_counter() - start
+
+def load_manifest(manifest_path):
+    try:
+        with open(manifest_path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_manifest(manifest, manifest_path):
+    temp_path = f'{manifest_path}.{os.getpid()}.tmp'
+    with open(temp_path, 'w') as f:
+        json.dump(manifest, f, indent=4)
+    os.replace(temp_path, manifest_path)
+
+def json_to_csv(raw_data_dir=raw_data_dir, csv_data_dir=csv_data_dir, workers=None, force=False):
+    """
+    Convert the sessions in raw_data_dir to CSV files in csv_data_dir, skipping sessions
+    whose source is unchanged since the last run.
+
+    Parameters:
+    raw_data_dir: Directory of user_data JSON files.
+    csv_data_dir: Output directory; also holds the change manifest.
+    workers: Number of worker processes (defaults to the number of CPUs).
+    force: Convert every session regardless of the manifest.
+
+    Returns a report dictionary with the converted, skipped and failed files and timings.
+    """
+    start = perf_counter()
 
     # Ensure the csv_data folder exists
     os.makedirs(csv_data_dir, exist_ok=True)
+    manifest_path = os.path.join(csv_data_dir, manifest_name)
+    manifest = {} if force else load_manifest(manifest_path)
 
-    # Loop over all files in the raw_data directory
-    for json_filename in os.listdir(raw_data_dir):
-        if json_filename.endswith('.json'):
-            json_filepath = os.path.join(raw_data_dir, json_filename)
-
-            # Read the JSON file
-            with open(json_filepath, 'r') as json_file:
-                data = json.load(json_file)
-
-            # Create the corresponding CSV filename
-            csv_filename = json_filename.replace('.json', '.csv')
-            csv_filepath = os.path.join(csv_data_dir, csv_filename)
-
-            # Extract relevant data and write to CSV
-            with open(csv_filepath, 'w', newline='') as csv_file:
-                csv_writer = csv.writer(csv_file)
-
-                # Write user information once at the top, using "NIL" for missing data
-                user_info_headers = ['name', 'age', 'gender', 'email', 'phone']
-                user_info = [
-                    data.get('name', 'NIL'), 
-                    data.get('age', 'NIL'), 
-                    data.get('gender', 'NIL'), 
-                    data.get('email', 'NIL') if data.get('email') else 'NIL',
-                    data.get('phone', 'NIL') if data.get('phone') else 'NIL'
-                ]
-                csv_writer.writerow(user_info_headers)
-                csv_writer.writerow(user_info)
-
-                # Write usable data headers, now with trial_direction and trial_speed
-                data_headers = ['frequency', 'trial_direction', 'trial_speed', 'change_detected', 'direction', 'speed', 'start_time']
-                csv_writer.writerow(data_headers)
-
-                # Iterate through the responses and write usable data, using "NIL" for missing data
-                for response in data['responses']:
-                    trial_sound = response.get('trial_sound', 'NIL')
-
-                    # Default values for trial_direction and trial_speed
-                    trial_direction = 'NIL'
-                    trial_speed = 'NIL'
-
-                    # Check if trial_sound is left/right and fast/slow, and split accordingly
-                    if trial_sound != 'constant' and trial_sound != 'NIL':
-                        direction, speed = trial_sound.split('_')
-                        trial_direction = direction
-                        trial_speed = speed
-
-                    # Write row with trial_direction and trial_speed
-                    row = [
-                        response.get('frequency', 'NIL'),
-                        trial_direction,
-                        trial_speed,
-                        response.get('change_detected', 'NIL'),
-                        response.get('direction', 'NIL'),
-                        response.get('speed', 'NIL'),
-                        response.get('start_time', 'NIL')
-                    ]
-                    csv_writer.writerow(row)
-
-            print(f"Converted {json_filename} to {csv_filename}")
+    # Sessions whose size and mtime match the manifest (and whose CSV exists) are skipped
+    # without being read; anything else is hashed and converted if its content changed
+    report = {'converted': [], 'skipped': [], 'failed': []}
+    jobs = []
+    for json_filename in sorted(os.listdir(raw_data_dir)):
+        if not json_filename.endswith('.json'):
+            continue
+        json_filepath = os.path.join(raw_data_dir, json_filename)
+        csv_filepath = os.path.join(csv_data_dir, json_filename.replace('.json', '.csv'))
+        known = manifest.get(json_filename, {})
+        stat = os.stat(json_filepath)
+        if known.get('mtime_ns') == stat.st_mtime_ns and known.get('size') == stat.st_size and os.path.exists(csv_filepath):
+            report['skipped'].append(json_filename)
+            continue
+        jobs.append((json_filename, json_filepath, csv_filepath, known.get('sha256')))
+
+    if len(jobs) > 1 and workers != 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(convert_one, jobs))
+    else:
+        # Not worth starting a pool for a single file
+        results = [convert_one(job) for job in jobs]
+
+    for json_filename, status, detail, seconds in results:
+        if status == 'failed':
+            report['failed'].append({'file': json_filename, 'error': detail, 'seconds': seconds})
+            continue
+        manifest[json_filename] = detail
+        if status == 'converted':
+            report['converted'].append({'file': json_filename, 'rows': detail['rows'], 'seconds': seconds})
+        else:
+            report['skipped'].append(json_filename)
+
+    # Forget sessions that were removed from raw_data
+    existing = set(os.listdir(raw_data_dir))
+    manifest = {name: entry for name, entry in manifest.items() if name in existing}
+    save_manifest(manifest, manifest_path)
+
+    report['seconds'] = perf_counter() - start
+    return report
 
 if __name__ == '__main__':
-    json_to_csv()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Convert raw session JSON files to CSV, only redoing new or changed sessions.')
+    parser.add_argument('--workers', type=int, default=None, help='Number of worker processes (default: all CPUs)')
+    parser.add_argument('--force', action='store_true', help='Convert every session, ignoring the manifest')
+    args = parser.parse_args()
+
+    report = json_to_csv(workers=args.workers, force=args.force)
+    for converted in report['converted']:
+        print(f"Converted {converted['file']} ({converted['rows']} rows, {converted['seconds'] * 1000:.1f} ms)")
+    for failed in report['failed']:
+        print(f"FAILED {failed['file']}: {failed['error']}")
+    print(f"{len(report['converted'])} converted, {len(report['skipped'])} skipped, {len(report['failed'])} failed in {report['seconds']:.2f} s")
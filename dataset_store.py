@@ -0,0 +1,259 @@
+import os
+import json
+import hashlib
+import argparse
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+default_store_dir = os.path.join(os.path.dirname(__file__), 'dataset')
+raw_data_dir = os.path.join(os.path.dirname(__file__), 'raw_data')
+
+# Categorical trial columns are stored as int8 codes into these categories; -1 is 'NIL'
+categories = {
+    'trial_direction': ['left', 'right'],
+    'trial_speed': ['fast', 'slow'],
+    'direction': ['left', 'right'],
+    'speed': ['fast', 'slow'],
+}
+
+# Integer perf_counter_ns timestamps recorded by newer sessions (missing in older ones)
+timestamp_ns_columns = ['start_ns', 'onset_ns', 'change_detected_ns', 'direction_ns', 'speed_ns']
+
+
+def session_tables(data, participant_id, batch):
+    """
+    Turn one user_data JSON session into a participants row and a typed trials frame.
+    """
+    responses = data['responses']
+    participant = pd.DataFrame({
+        'participant_id': [participant_id],
+        'name': [data.get('name')],
+        'age': pd.array([pd.to_numeric(data.get('age'), errors='coerce')], dtype='Int16'),
+        'gender': [data.get('gender') or None],
+        'email': [data.get('email') or None],
+        'phone': [data.get('phone') or None],
+        'trials': np.array([len(responses)], dtype=np.int32),
+        'batch': np.array([batch], dtype=np.int32),
+    })
+
+    # Split trial_sound ('left_fast', 'constant', ...) into the direction and speed presented
+    trial_sounds = [response.get('trial_sound', 'NIL') for response in responses]
+    presented = [sound.split('_') if sound not in ('constant', 'NIL') else ('NIL', 'NIL') for sound in trial_sounds]
+    values = {
+        'trial_direction': [direction for direction, _ in presented],
+        'trial_speed': [speed for _, speed in presented],
+        'direction': [response.get('direction', 'NIL') for response in responses],
+        'speed': [response.get('speed', 'NIL') for response in responses],
+    }
+
+    trials = pd.DataFrame({
+        'participant_id': participant_id,
+        'trial': np.arange(len(responses), dtype=np.int16),
+        'frequency': np.array([response.get('frequency', -1) for response in responses], dtype=np.int16),
+    })
+    for column, names in categories.items():
+        trials[column] = pd.Categorical(values[column], categories=names).codes.astype(np.int8)
+    trials['change_detected'] = np.array([
+        {True: 1, False: 0}.get(response.get('change_detected'), -1) for response in responses
+    ], dtype=np.int8)
+    trials['start_time'] = pd.to_datetime([response.get('start_time') for response in responses], errors='coerce').astype('datetime64[us]')
+    for column in timestamp_ns_columns:
+        trials[column] = pd.array([response.get(column) for response in responses], dtype='Int64')
+    trials['batch'] = np.int32(batch)
+    return participant, trials
+
+
+class DatasetStore:
+    """
+    One columnar (Parquet) store for every session, replacing per-participant CSV files.
+
+    participants/ holds one row per session; trials/frequency=<f>/ holds the trials at each
+    frequency, so a load filtered on frequency only opens those partitions. Every import
+    appends a new batch of files, and manifest.json records which batch holds the current
+    version of each session: re-importing a changed session supersedes its old rows without
+    rewriting them, and compact() drops superseded rows. Needs pyarrow.
+    """
+    def __init__(self, root=default_store_dir):
+        self.root = root
+        self.manifest_path = os.path.join(root, 'manifest.json')
+        try:
+            with open(self.manifest_path, 'r') as f:
+                self.manifest = json.load(f)
+        except (OSError, ValueError):
+            self.manifest = {'batches': 0, 'participants': {}}
+
+    def add_sessions(self, json_paths):
+        """
+        Import user_data JSON sessions that are new or changed since they were last imported.
+        Sessions that cannot be read or parsed are left out of the batch.
+
+        Returns (participant ids imported, {participant id: error message} for failed sessions).
+        """
+        batch = self.manifest['batches'] + 1
+        sessions, failed = [], {}
+        for json_path in json_paths:
+            participant_id = os.path.splitext(os.path.basename(json_path))[0]
+            try:
+                with open(json_path, 'rb') as f:
+                    content = f.read()
+                digest = hashlib.sha256(content).hexdigest()
+                known = self.manifest['participants'].get(participant_id)
+                if known is not None and known['sha256'] == digest:
+                    continue
+                participant, trials = session_tables(json.loads(content), participant_id, batch)
+            except (OSError, ValueError, KeyError, TypeError, AttributeError) as error:
+                failed[participant_id] = f'{type(error).__name__}: {error}'
+                continue
+            sessions.append((participant_id, digest, participant, trials))
+        if not sessions:
+            return [], failed
+
+        _, _, participants, trials = zip(*sessions)
+        self._write(pd.concat(participants, ignore_index=True), os.path.join('participants', f'part-{batch:06d}.parquet'))
+        trials = pd.concat(trials, ignore_index=True)
+        for frequency, partition in trials.groupby('frequency', sort=True):
+            self._write(partition.drop(columns='frequency'), os.path.join('trials', f'frequency={frequency}', f'part-{batch:06d}.parquet'))
+
+        # The manifest is the commit point: files of a batch it does not reference are ignored
+        self.manifest['batches'] = batch
+        for participant_id, digest, _, _ in sessions:
+            self.manifest['participants'][participant_id] = {'sha256': digest, 'batch': batch, 'imported': datetime.now().isoformat()}
+        self._save_manifest()
+        return [participant_id for participant_id, _, _, _ in sessions], failed
+
+    def add_folder(self, folder=raw_data_dir):
+        """
+        Import every new or changed user_data JSON session in a folder.
+        Returns (participant ids imported, {participant id: error message}) like add_sessions.
+        """
+        return self.add_sessions([os.path.join(folder, name) for name in sorted(os.listdir(folder)) if name.endswith('.json')])
+
+    def frequencies(self):
+        """
+        Return the frequencies that have a trials partition.
+        """
+        trials_dir = os.path.join(self.root, 'trials')
+        if not os.path.isdir(trials_dir):
+            return []
+        return sorted(int(name.split('=')[1]) for name in os.listdir(trials_dir) if name.startswith('frequency='))
+
+    def load_participants(self):
+        """
+        Return the participants table (current version of each session).
+        """
+        frame = self._read_partition(os.path.join(self.root, 'participants'))
+        return self._current(frame).drop(columns='batch').reset_index(drop=True)
+
+    def load_trials(self, frequencies=None, participants=None, columns=None, decode=True):
+        """
+        Load trials, reading only the partitions of the requested frequencies.
+
+        Parameters:
+        frequencies: Frequencies to load (all if None).
+        participants: Participant ids to keep (all if None).
+        columns: Columns to read (all if None); frequency is always included.
+        decode: Turn the int8 codes back into pandas categoricals and a nullable boolean
+            change_detected; with False the raw codes are returned.
+        """
+        if frequencies is None:
+            frequencies = self.frequencies()
+        read_columns = None if columns is None else list(dict.fromkeys([*columns, 'participant_id', 'batch']))
+
+        frames = []
+        for frequency in frequencies:
+            frame = self._read_partition(os.path.join(self.root, 'trials', f'frequency={frequency}'), read_columns)
+            if len(frame):
+                frame.insert(0, 'frequency', np.int16(frequency))
+                frames.append(frame)
+        if not frames:
+            return pd.DataFrame(columns=['frequency'] + (columns or []))
+        trials = self._current(pd.concat(frames, ignore_index=True))
+        if participants is not None:
+            trials = trials[trials['participant_id'].isin(participants)]
+        trials = trials.drop(columns='batch').reset_index(drop=True)
+        trials['participant_id'] = trials['participant_id'].astype('category')
+
+        if decode:
+            for column, names in categories.items():
+                if column in trials:
+                    trials[column] = pd.Categorical.from_codes(trials[column], categories=names)
+            if 'change_detected' in trials:
+                trials['change_detected'] = pd.array(trials['change_detected'].map({1: True, 0: False}), dtype='boolean')
+        if columns is not None:
+            trials = trials[['frequency'] + [column for column in columns if column != 'frequency']]
+        return trials
+
+    def compact(self):
+        """
+        Rewrite each partition as a single file holding only the current rows.
+
+        The new files are written first, then the manifest is switched over to them, and only
+        then are the old files removed, so an interruption at any point leaves a readable store.
+        """
+        batch = self.manifest['batches'] + 1
+        partitions = [os.path.join(self.root, 'participants')] + [
+            os.path.join(self.root, 'trials', f'frequency={frequency}') for frequency in self.frequencies()
+        ]
+        old_files = []
+        for directory in partitions:
+            old_files += self._partition_files(directory)
+            frame = self._current(self._read_partition(directory))
+            frame['batch'] = np.int32(batch)
+            self._write(frame, os.path.relpath(os.path.join(directory, f'part-{batch:06d}.parquet'), self.root))
+
+        # Commit point: from here on the manifest only references the new files
+        self.manifest['batches'] = batch
+        for entry in self.manifest['participants'].values():
+            entry['batch'] = batch
+        self._save_manifest()
+
+        for path in old_files:
+            os.remove(path)
+
+    def _current(self, frame):
+        # Keep only the rows from the batch that holds each participant's current session
+        current = {participant_id: entry['batch'] for participant_id, entry in self.manifest['participants'].items()}
+        return frame[frame['batch'].to_numpy() == frame['participant_id'].map(current).to_numpy()]
+
+    def _partition_files(self, directory):
+        if not os.path.isdir(directory):
+            return []
+        return [os.path.join(directory, name) for name in sorted(os.listdir(directory)) if name.endswith('.parquet')]
+
+    def _read_partition(self, directory, columns=None):
+        frames = [pd.read_parquet(path, columns=columns) for path in self._partition_files(directory)]
+        if not frames:
+            return pd.DataFrame(columns=['participant_id', 'batch'])
+        return pd.concat(frames, ignore_index=True)
+
+    def _write(self, frame, relative_path):
+        # Write to a temporary file first so readers never see a partial Parquet file
+        path = os.path.join(self.root, relative_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f'{path}.{os.getpid()}.tmp'
+        frame.to_parquet(temp_path, index=False)
+        os.replace(temp_path, path)
+
+    def _save_manifest(self):
+        os.makedirs(self.root, exist_ok=True)
+        temp_path = f'{self.manifest_path}.{os.getpid()}.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(self.manifest, f, indent=4)
+        os.replace(temp_path, self.manifest_path)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Import raw sessions into the columnar dataset store.')
+    parser.add_argument('--store', default=default_store_dir, help='Store directory')
+    parser.add_argument('--raw-data', default=raw_data_dir, help='Folder of user_data JSON sessions to import')
+    parser.add_argument('--compact', action='store_true', help='Rewrite every partition without superseded rows')
+    args = parser.parse_args()
+
+    store = DatasetStore(args.store)
+    imported, failed = store.add_folder(args.raw_data)
+    for participant_id, error in failed.items():
+        print(f"FAILED {participant_id}: {error}")
+    print(f"Imported {len(imported)} new or changed sessions ({len(store.manifest['participants'])} in the store)")
+    if args.compact:
+        store.compact()
+        print("Compacted the store")
@@ -11,21 +11,33 @@ for package in required_packages:
 print("Packages installed successfully. Please restart the script.")
 """
 
-import json
 import random
 import os
 from PyQt5.QtWidgets import QApplication, QPushButton, QWidget, QLabel, QVBoxLayout, QHBoxLayout, QProgressBar, QLineEdit, QRadioButton, QButtonGroup, QMessageBox, QCheckBox
-from PyQt5.QtCore import Qt, QTimer
-from PyQt5.QtGui import QPixmap, QPalette, QColor
+from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QPalette, QColor
 from datetime import datetime
+from time import perf_counter_ns
 import shift as sft  # This is my personal made library for sound shifting
-
-# Sound shifting functions
-fl = lambda x: sft.sound_shift(x, 'phase', 'left', 'short')
-fr = lambda x: sft.sound_shift(x, 'phase', 'right', 'short')
-sl = lambda x: sft.sound_shift(x, 'phase', 'left', 'long')
-sr = lambda x: sft.sound_shift(x, 'phase', 'right', 'long')
-cnst = lambda x: sft.sound_shift(x, 'flat')
+from qt_playback import PlaybackNotifier
+from qt_resources import get_pixmaps
+from stimulus_bank import get_bank
+from trial_log import TrialLog, compact
+from trial_scheduler import TrialScheduler
+
+# Sound shifting functions (pre-rendered once and cached, non-blocking, each returns a PlaybackHandle)
+fl = lambda x: get_bank().play(x, 'phase', 'left', 'short')
+fr = lambda x: get_bank().play(x, 'phase', 'right', 'short')
+sl = lambda x: get_bank().play(x, 'phase', 'left', 'long')
+sr = lambda x: get_bank().play(x, 'phase', 'right', 'long')
+cnst = lambda x: get_bank().play(x, 'flat')
+
+# Icon names (resources/<name>-on.png / -off.png) for the left and right arrows of each question
+question_icons = {
+    'Q1': ('yes', 'no'),  # Q1: Was there a change? (Yes/No)
+    'Q2': ('left', 'right'),  # Q2: Which direction? (Left/Right)
+    'Q3': ('fast', 'slow'),  # Q3: How fast? (Fast/Slow)
+}
 
 
 class UserDataWindow(QWidget):
@@ -129,6 +141,15 @@ class ExperimentWindow(QWidget):
             'responses': []
         }
 
+        # Log every completed trial to disk as it happens, so a crash does not lose the session
+        raw_data_path = os.path.join(os.path.dirname(__file__), 'raw_data')
+        self.log_path = os.path.join(raw_data_path, f'user_data_{name}.jsonl')
+        if os.path.exists(self.log_path):
+            # Keep the log of an earlier session that never finished; trial_log.py recovers it
+            stamp = datetime.fromtimestamp(os.path.getmtime(self.log_path)).strftime('%Y%m%d-%H%M%S')
+            os.replace(self.log_path, os.path.join(raw_data_path, f'user_data_{name}.{stamp}.jsonl'))
+        self.trial_log = TrialLog(self.log_path, self.user_data)
+
         # Main label to display instructions
         self.label = QLabel('Press Space to start the experiment', self)
         self.label.setAlignment(Qt.AlignCenter)
@@ -144,9 +165,12 @@ class ExperimentWindow(QWidget):
         self.progress_bar = QProgressBar(self)
         self.progress_bar.setMaximum(120)  # For 120 trials (updated)
 
-        # Visual Arrow Buttons (for Left/Right)
+        # Visual Arrow Buttons (for Left/Right), using icons decoded once and shared between windows
+        self.pixmaps = get_pixmaps()
         self.left_arrow = QLabel(self)
         self.right_arrow = QLabel(self)
+        self.arrow_icons = {}  # Icon name currently shown on each arrow label
+        self.icon_update_ns = 0  # Slowest icon update of the current trial
         self.left_option_label = QLabel("")
         self.right_option_label = QLabel("")
         self.left_option_label.setAlignment(Qt.AlignCenter)  # Center align option labels
@@ -175,10 +199,25 @@ class ExperimentWindow(QWidget):
         self.question_stage = None  # Q1, Q2, Q3
         self.current_trial = None
         self.current_trial_start_time = None  # Store start time for each trial
+        # Monotonic timestamps (time.perf_counter_ns) for reaction times: trial start and sound onset at the DAC
+        self.current_trial_start_ns = None
+        self.current_trial_onset_ns = None
+        # Where the trial is: 'idle' (waiting for Space/R), 'listen' (before the sound), 'playing',
+        # 'after_sound' (before Q1), 'question' (waiting for an answer) or 'answered' (moving on)
+        self.trial_state = 'idle'
+        self.current_playback = None
+        self.current_trial_audio = None  # Audio callback summary for the last sound played
+
+        # Playback runs in the background; continue the trial when it finishes
+        self.playback_notifier = PlaybackNotifier(self)
+        self.playback_notifier.finished.connect(self.on_sound_finished)
+
+        # Runs the trial stages at fixed offsets from their anchors, so delays do not drift
+        self.scheduler = TrialScheduler(self)
 
         # Generate 3 conditions per frequency (Left, Right, Flat) with random speeds
         sound_conditions = ['left', 'right', 'flat']
-        frequencies = list(range(0, 2050, 50))
+        frequencies = sft.trial_frequencies
         speeds = ['short', 'long']
 
         self.trials = [
@@ -207,69 +246,120 @@ class ExperimentWindow(QWidget):
             self.current_trial = self.trials[self.current_trial_index]
             self.current_trial_index += 1
 
+        # Make sure this trial's stimulus is rendering (normally it was prefetched while the
+        # previous trial's questions were answered), so onset is just a buffer handoff
+        self.prefetch_trial(self.current_trial)
+
         # Update progress bar
         self.progress_bar.setValue(self.current_trial_index)
 
         # Log the starting time of the trial
         self.current_trial_start_time = datetime.now().isoformat()
+        self.current_trial_start_ns = self.scheduler.start_trial()
+        self.icon_update_ns = 0
+        self.trial_state = 'listen'
 
         # Show "Listen carefully!" before playing the sound
         self.listen_label.setText("Listen carefully!")
 
-        # Wait a short moment (500 ms) and then play the sound
-        QTimer.singleShot(500, self.play_sound_and_start_response)
+        # Play the sound 500 ms after the trial epoch
+        self.scheduler.schedule('play', 500, self.play_sound_and_start_response)
 
     def play_sound_and_start_response(self):
+        self.trial_state = 'playing'
+
         # Retrieve the condition and frequency from the current trial
         selected_condition = self.current_trial['sound']
         selected_frequency = self.current_trial['frequency']
 
-        # Play the sound based on the condition and frequency
+        # Save the actual condition and frequency for the current trial
+        self.current_trial_sound = selected_condition
+        self.current_trial_freq = selected_frequency
+
+        # Start the sound based on the condition and frequency; on_sound_finished continues the trial
         if selected_condition == 'left_fast':
-            fl(selected_frequency)
+            self.current_playback = fl(selected_frequency)
         elif selected_condition == 'left_slow':
-            sl(selected_frequency)
+            self.current_playback = sl(selected_frequency)
         elif selected_condition == 'right_fast':
-            fr(selected_frequency)
+            self.current_playback = fr(selected_frequency)
         elif selected_condition == 'right_slow':
-            sr(selected_frequency)
+            self.current_playback = sr(selected_frequency)
         elif selected_condition == 'constant':
-            cnst(selected_frequency)
+            self.current_playback = cnst(selected_frequency)
+        self.playback_notifier.watch(self.current_playback)
 
-        # Remove the "Listen carefully!" message after the sound finishes (after 1 second)
-        QTimer.singleShot(1000, self.clear_listen_label)
+    def on_sound_finished(self, handle):
+        if handle is not self.current_playback or handle.cancelled:
+            return
+        self.trial_state = 'after_sound'
+
+        # Keep the audio callback summary (underflows, callback timing, latency) for the trial record
+        self.current_trial_audio = handle.audio_stats
+        self.current_trial_onset_ns = handle.onset_ns
+
+        # Render the next trial's stimulus while the participant answers the questions
+        if self.current_trial_index < len(self.trials):
+            self.prefetch_trial(self.trials[self.current_trial_index])
+
+        # Anchor the next stages to when the sound actually ended at the DAC, not to when this
+        # notification reached the GUI thread
+        now_ns = perf_counter_ns()
+        if handle.onset_ns is not None:
+            sound_end_ns = handle.onset_ns + handle.total_frames * 1000000000 // handle.sound_gen.sample_rate
+            # The last frame has been rendered, so it reaches the DAC within the output latency.
+            # Offline backends (null, capture) render faster than real time and end much sooner
+            # than onset + duration, so they are not held to the wall-clock length of the sound.
+            latency_ms = (handle.audio_stats or {}).get('output_latency_ms') or 0
+            sound_end_ns = min(sound_end_ns, now_ns + int(latency_ms * 1000000))
+        else:
+            sound_end_ns = now_ns
 
-        # Save the actual condition and frequency for the current trial
-        self.current_trial_sound = selected_condition
-        self.current_trial_freq = selected_frequency
+        # Remove the "Listen carefully!" message and proceed to Q1 1 second after the sound
+        self.scheduler.schedule('clear_label', 1000, self.clear_listen_label, sound_end_ns)
+        self.scheduler.schedule('Q1', 1000, self.ask_question_1, sound_end_ns)
 
-        # Proceed to Q1 after a short delay (1 second)
-        QTimer.singleShot(1000, self.ask_question_1)
+    def prefetch_trial(self, trial):
+        """
+        Start rendering a trial's stimulus in the background (no-op if it is already rendered).
+        """
+        mode, direction, shift = sft.trial_sounds[trial['sound']]
+        get_bank().prefetch(trial['frequency'], mode, direction, shift)
 
     def clear_listen_label(self):
         self.listen_label.setText('')
 
     def ask_question_1(self):
         self.trial_active = True
+        self.trial_state = 'question'
         self.question_stage = "Q1"
         self.label.setText('Q1: Was there a change?')
         self.update_arrow_icons(True)  # Show arrows
         self.update_option_labels("Yes", "No")
 
     def ask_question_2(self):
+        self.trial_state = 'question'
         self.question_stage = "Q2"
         self.label.setText('Q2: Which direction?')
         self.update_arrow_icons(True)
         self.update_option_labels("Left", "Right")
 
     def ask_question_3(self):
+        self.trial_state = 'question'
         self.question_stage = "Q3"
         self.label.setText('Q3: How fast?')
         self.update_arrow_icons(True)
         self.update_option_labels("Fast", "Slow")
 
     def keyPressEvent(self, event):
-        if event.key() == Qt.Key_R:
+        # Timestamp the key press before anything else runs
+        pressed_ns = perf_counter_ns()
+
+        if self.trial_state not in ('idle', 'question'):
+            # Ignore keys while the sound plays and while the trial moves between stages
+            return
+
+        if event.key() == Qt.Key_R and self.current_trial is not None:
             # Reset the same trial when 'R' is pressed
             self.update_arrow_icons(False)  # Hide arrows
             self.update_option_labels()  # Clear options
@@ -284,37 +374,41 @@ class ExperimentWindow(QWidget):
             return
 
         if self.trial_active:
+            if event.key() in (Qt.Key_Left, Qt.Key_Right):
+                # One answer per question; further keys wait for the next stage
+                self.trial_state = 'answered'
+
             if self.question_stage == "Q1":
                 if event.key() == Qt.Key_Left:  # Yes, there was a change
-                    self.record_response("change_detected", True)
+                    self.record_response("change_detected", True, pressed_ns)
                     self.update_arrow_icons(left_selected=True)  # Light up left arrow
-                    QTimer.singleShot(500, self.ask_question_2)  # 0.5-second delay before Q2
+                    self.scheduler.schedule('Q2', 500, self.ask_question_2, pressed_ns)  # 0.5-second delay before Q2
                 elif event.key() == Qt.Key_Right:  # No change
-                    self.record_response("change_detected", False)
+                    self.record_response("change_detected", False, pressed_ns)
                     self.update_arrow_icons(right_selected=True)  # Light up right arrow
-                    QTimer.singleShot(500, self.end_trial)  # Skip remaining questions and end trial only if "No"
+                    self.scheduler.schedule('end_trial', 500, self.end_trial, pressed_ns)  # Skip remaining questions and end trial only if "No"
 
             elif self.question_stage == "Q2":
                 if event.key() == Qt.Key_Left:  # Left
-                    self.record_response("direction", "left")
+                    self.record_response("direction", "left", pressed_ns)
                     self.update_arrow_icons(left_selected=True)  # Light up left arrow
-                    QTimer.singleShot(500, self.ask_question_3)  # 0.5-second delay before Q3
+                    self.scheduler.schedule('Q3', 500, self.ask_question_3, pressed_ns)  # 0.5-second delay before Q3
                 elif event.key() == Qt.Key_Right:  # Right
-                    self.record_response("direction", "right")
+                    self.record_response("direction", "right", pressed_ns)
                     self.update_arrow_icons(right_selected=True)  # Light up right arrow
-                    QTimer.singleShot(500, self.ask_question_3)  # 0.5-second delay before Q3
+                    self.scheduler.schedule('Q3', 500, self.ask_question_3, pressed_ns)  # 0.5-second delay before Q3
 
             elif self.question_stage == "Q3":
                 if event.key() == Qt.Key_Left:  # Fast
-                    self.record_response("speed", "fast")
+                    self.record_response("speed", "fast", pressed_ns)
                     self.update_arrow_icons(left_selected=True)  # Light up left arrow
-                    QTimer.singleShot(500, self.end_trial)  # 0.5-second delay before ending the trial
+                    self.scheduler.schedule('end_trial', 500, self.end_trial, pressed_ns)  # 0.5-second delay before ending the trial
                 elif event.key() == Qt.Key_Right:  # Slow
-                    self.record_response("speed", "slow")
+                    self.record_response("speed", "slow", pressed_ns)
                     self.update_arrow_icons(right_selected=True)  # Light up right arrow
-                    QTimer.singleShot(500, self.end_trial)  # 0.5-second delay before ending the trial
+                    self.scheduler.schedule('end_trial', 500, self.end_trial, pressed_ns)  # 0.5-second delay before ending the trial
 
-    def record_response(self, question, answer):
+    def record_response(self, question, answer, pressed_ns):
         # Log the response and the trial start time if it's a new trial
         if len(self.user_data['responses']) < self.current_trial_index:
             self.user_data['responses'].append({
@@ -322,8 +416,15 @@ class ExperimentWindow(QWidget):
                 'trial_sound': self.current_trial_sound,
                 'start_time': self.current_trial_start_time  # Store the start time
             })
-        
-        self.user_data['responses'][-1][question] = answer
+
+        # Integer perf_counter_ns timestamps on one clock: reaction time = <question>_ns - onset_ns.
+        # A repeated trial refreshes them and the audio diagnostics with the latest presentation.
+        response = self.user_data['responses'][-1]
+        response['start_ns'] = self.current_trial_start_ns
+        response['onset_ns'] = self.current_trial_onset_ns
+        response['audio'] = self.current_trial_audio  # Underflows and callback timing during the sound
+        response[question] = answer
+        response[f'{question}_ns'] = pressed_ns
 
     def update_arrow_icons(self, show_arrows=True, left_selected=False, right_selected=False):
         """
@@ -331,50 +432,30 @@ class ExperimentWindow(QWidget):
         If an arrow is selected, change its color to green.
         Show or hide the arrows based on the 'show_arrows' argument.
         """
-        if self.question_stage == "Q1":  # Q1: Was there a change? (Yes/No)
+        update_start = perf_counter_ns()
+        icons = question_icons.get(self.question_stage)
+        if icons is not None:
             if show_arrows:
-                if left_selected:
-                    self.left_arrow.setPixmap(QPixmap(os.path.join(os.path.dirname(__file__), 'resources/yes-on.png')))
-                else:
-                    self.left_arrow.setPixmap(QPixmap(os.path.join(os.path.dirname(__file__), 'resources/yes-off.png')))
-                    
-                if right_selected:
-                    self.right_arrow.setPixmap(QPixmap(os.path.join(os.path.dirname(__file__), 'resources/no-on.png')))
-                else:
-                    self.right_arrow.setPixmap(QPixmap(os.path.join(os.path.dirname(__file__), 'resources/no-off.png')))
+                left_icon, right_icon = icons
+                self.set_arrow(self.left_arrow, f"{left_icon}-{'on' if left_selected else 'off'}")
+                self.set_arrow(self.right_arrow, f"{right_icon}-{'on' if right_selected else 'off'}")
             else:
-                self.left_arrow.clear()
-                self.right_arrow.clear()
+                self.set_arrow(self.left_arrow, None)
+                self.set_arrow(self.right_arrow, None)
+        self.icon_update_ns = max(self.icon_update_ns, perf_counter_ns() - update_start)
 
-        elif self.question_stage == "Q2":  # Q2: Which direction? (Left/Right)
-            if show_arrows:
-                if left_selected:
-                    self.left_arrow.setPixmap(QPixmap(os.path.join(os.path.dirname(__file__), 'resources/left-on.png')))
-                else:
-                    self.left_arrow.setPixmap(QPixmap(os.path.join(os.path.dirname(__file__), 'resources/left-off.png')))
-                    
-                if right_selected:
-                    self.right_arrow.setPixmap(QPixmap(os.path.join(os.path.dirname(__file__), 'resources/right-on.png')))
-                else:
-                    self.right_arrow.setPixmap(QPixmap(os.path.join(os.path.dirname(__file__), 'resources/right-off.png')))
-            else:
-                self.left_arrow.clear()
-                self.right_arrow.clear()
-
-        elif self.question_stage == "Q3":  # Q3: How fast? (Fast/Slow)
-            if show_arrows:
-                if left_selected:
-                    self.left_arrow.setPixmap(QPixmap(os.path.join(os.path.dirname(__file__), 'resources/fast-on.png')))
-                else:
-                    self.left_arrow.setPixmap(QPixmap(os.path.join(os.path.dirname(__file__), 'resources/fast-off.png')))
-                    
-                if right_selected:
-                    self.right_arrow.setPixmap(QPixmap(os.path.join(os.path.dirname(__file__), 'resources/slow-on.png')))
-                else:
-                    self.right_arrow.setPixmap(QPixmap(os.path.join(os.path.dirname(__file__), 'resources/slow-off.png')))
-            else:
-                self.left_arrow.clear()
-                self.right_arrow.clear()
+    def set_arrow(self, arrow, icon):
+        """
+        Show a cached icon (or nothing if icon is None) on an arrow label, skipping the
+        update if the label already shows it.
+        """
+        if self.arrow_icons.get(arrow) == icon:
+            return
+        self.arrow_icons[arrow] = icon
+        if icon is None:
+            arrow.clear()
+        else:
+            arrow.setPixmap(self.pixmaps[icon])
 
     def update_option_labels(self, left_text="", right_text=""):
         """
@@ -384,33 +465,40 @@ class ExperimentWindow(QWidget):
         self.right_option_label.setText(right_text)
 
     def end_trial(self):
+        # Keep the trial's stage timeline (scheduled vs actual, in microseconds from the trial epoch)
+        response = self.user_data['responses'][-1]
+        response['timeline'] = self.scheduler.record()
+        response['timing_ok'] = self.scheduler.on_time()
+        response['icon_update_us'] = self.icon_update_ns // 1000
+
+        # The trial's answers are complete: append them to the log
+        self.trial_log.append(self.current_trial_index, self.user_data['responses'][-1])
+
         # Clear arrows and labels before ending the trial
         self.update_arrow_icons(False)  # Hide arrows
         self.update_option_labels()  # Clear options
         
         self.label.setText('Press Space to start the next trial or R to repeat.')
         self.trial_active = False
+        self.trial_state = 'idle'
         self.question_stage = None
 
     def end_experiment(self):
         self.label.setText('Experiment complete!')
 
     def closeEvent(self, event):
-        # Save the collected data when the window is closed
-        raw_data_path = os.path.join(os.path.dirname(__file__), 'raw_data')
-        os.makedirs(raw_data_path, exist_ok=True)
-        file_path = os.path.join(raw_data_path, f'user_data_{self.user_data["name"]}.json')
-        
-        organized_data = sorted(self.user_data['responses'], key=lambda x: x['frequency'])
-        with open(file_path, 'w') as f:
-            json.dump({
-                'name': self.user_data['name'],
-                'age': self.user_data['age'],
-                'gender': self.user_data['gender'],
-                'email': self.user_data['email'],  # Save email
-                'phone': self.user_data['phone'],  # Save phone
-                'responses': organized_data
-            }, f, indent=4)
+        # Stop any pending stage and any sound still playing
+        self.scheduler.cancel()
+        if self.current_playback is not None:
+            self.current_playback.cancel()
+
+        # Log the answers of a trial interrupted by closing the window
+        if self.trial_active and len(self.user_data['responses']) == self.current_trial_index:
+            self.trial_log.append(self.current_trial_index, self.user_data['responses'][-1])
+
+        # Compact the trial log into the session's JSON file
+        self.trial_log.close()
+        compact(self.log_path)
         event.accept()
 
 
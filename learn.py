@@ -1,14 +1,15 @@
 import sys
 from PyQt5.QtWidgets import QApplication, QWidget, QLabel, QVBoxLayout, QHBoxLayout, QRadioButton, QPushButton, QSlider, QButtonGroup
 from PyQt5.QtCore import Qt
-import shift as sft  # Assuming this is your custom sound-shifting library
+from qt_playback import PlaybackNotifier
+from stimulus_bank import get_bank
 
-# Sound shifting functions based on your library
-fl = lambda x: sft.sound_shift(x, 'phase', 'left', 'short')
-fr = lambda x: sft.sound_shift(x, 'phase', 'right', 'short')
-sl = lambda x: sft.sound_shift(x, 'phase', 'left', 'long')
-sr = lambda x: sft.sound_shift(x, 'phase', 'right', 'long')
-cnst = lambda x: sft.sound_shift(x, 'flat')
+# Sound shifting functions based on your library (pre-rendered once and cached, non-blocking, each returns a PlaybackHandle)
+fl = lambda x: get_bank().play(x, 'phase', 'left', 'short')
+fr = lambda x: get_bank().play(x, 'phase', 'right', 'short')
+sl = lambda x: get_bank().play(x, 'phase', 'left', 'long')
+sr = lambda x: get_bank().play(x, 'phase', 'right', 'long')
+cnst = lambda x: get_bank().play(x, 'flat')
 
 class LearnWindow(QWidget):
     def __init__(self):
@@ -62,6 +63,11 @@ class LearnWindow(QWidget):
         self.play_button = QPushButton('Play Sound', self)
         self.play_button.clicked.connect(self.play_sound)
 
+        # Playback runs in the background; re-enable the button when it finishes
+        self.current_playback = None
+        self.playback_notifier = PlaybackNotifier(self)
+        self.playback_notifier.finished.connect(self.on_sound_finished)
+
         # Layout
         layout = QVBoxLayout()
         layout.addWidget(self.freq_label)
@@ -88,15 +94,31 @@ class LearnWindow(QWidget):
 
         # Play the sound based on user selection
         if direction == 'Left' and speed == 'Short':
-            fl(freq)
+            self.current_playback = fl(freq)
         elif direction == 'Left' and speed == 'Long':
-            sl(freq)
+            self.current_playback = sl(freq)
         elif direction == 'Right' and speed == 'Short':
-            fr(freq)
+            self.current_playback = fr(freq)
         elif direction == 'Right' and speed == 'Long':
-            sr(freq)
+            self.current_playback = sr(freq)
         elif direction == 'Flat':
-            cnst(freq)
+            self.current_playback = cnst(freq)
+
+        self.play_button.setEnabled(False)
+        self.play_button.setText('Playing...')
+        self.playback_notifier.watch(self.current_playback)
+
+    def on_sound_finished(self, handle):
+        if handle is not self.current_playback:
+            return
+        self.play_button.setEnabled(True)
+        self.play_button.setText('Play Sound')
+
+    def closeEvent(self, event):
+        # Stop any sound still playing
+        if self.current_playback is not None:
+            self.current_playback.cancel()
+        event.accept()
 
     def get_selected_direction(self):
         if self.left_radio.isChecked():
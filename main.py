@@ -1,23 +1,154 @@
-from experiment import UserDataWindow
+import os
 import sys
-import subprocess
+import json
+import argparse
+from time import perf_counter
 
+base_dir = os.path.dirname(os.path.abspath(__file__))
+requirements_path = os.path.join(base_dir, 'requirements.txt')
+lock_path = os.path.join(base_dir, 'requirements.lock')  # name==version lines, written by --lock
+check_cache_path = os.path.join(base_dir, '.dependency_check.json')
 
-# Reinstall necessary packages
-required_packages = ['PyQt5', 'numpy', 'pandas', 'sounddevice']
+# Used by the analysis scripts (analyse, csv_analysis, pipeline, dataset_store) but not by the
+# experiment, so they are not in requirements.txt and are not checked at launch
+analysis_packages = ['pandas', 'scipy', 'pyarrow']
 
-for package in required_packages:
-    subprocess.check_call([sys.executable, '-m', 'pip', 'install', package])
-    subprocess.check_call([sys.executable, '-m', 'pip', 'install', '--upgrade', package])
-print("Packages installed successfully.")
 
-from PyQt5.QtWidgets import QApplication
+def read_requirements(file_path):
+    """
+    Read a requirements or lock file and return {package name: pinned version or None}.
+    """
+    packages = {}
+    with open(file_path, 'r') as f:
+        for line in f:
+            line = line.split('#')[0].strip()
+            if line:
+                name, _, version = line.partition('==')
+                packages[name.strip()] = version.strip() or None
+    return packages
+
+def installed_version(package):
+    # Read the installed version from the package metadata, without importing the package
+    from importlib.metadata import version, PackageNotFoundError
+    try:
+        return version(package)
+    except PackageNotFoundError:
+        return None
+
+def environment_key(source_path):
+    """
+    Identify the interpreter and its installed packages cheaply: the executable, the lock or
+    requirements file, and the modification times of the site-packages directories (which
+    change whenever a package is installed or removed).
+    """
+    stamps = {}
+    for path in [source_path] + [p for p in sys.path if p.endswith('site-packages')]:
+        try:
+            stamps[path] = os.stat(path).st_mtime_ns
+        except OSError:
+            pass
+    return {'executable': sys.executable, 'stamps': stamps}
+
+def check_dependencies():
+    """
+    Check that the packages the experiment needs at runtime are installed, against
+    requirements.lock if it exists (otherwise requirements.txt). The analysis scripts' own
+    dependencies (analysis_packages) are not checked. A successful check is cached, so later
+    launches in the same environment only compare a few file timestamps.
+
+    Returns (missing, mismatched): package names that are not installed, and
+    (name, locked version, installed version) for packages at a different version.
+    """
+    source_path = lock_path if os.path.exists(lock_path) else requirements_path
+    key = environment_key(source_path)
+    try:
+        with open(check_cache_path, 'r') as f:
+            if json.load(f) == key:
+                return [], []
+    except (OSError, ValueError):
+        pass
+
+    missing, mismatched = [], []
+    for package, locked in read_requirements(source_path).items():
+        version = installed_version(package)
+        if version is None:
+            missing.append(package)
+        elif locked is not None and version != locked:
+            mismatched.append((package, locked, version))
+
+    if not missing and not mismatched:
+        try:
+            with open(check_cache_path, 'w') as f:
+                json.dump(key, f, indent=4)
+        except OSError:
+            pass
+    return missing, mismatched
+
+def write_lock():
+    """
+    Pin the currently installed version of every package in requirements.txt to requirements.lock.
+    """
+    lines = []
+    for package in read_requirements(requirements_path):
+        version = installed_version(package)
+        if version is None:
+            sys.exit(f"{package} is not installed; install it before locking.")
+        lines.append(f'{package}=={version}')
+    with open(lock_path, 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+    print(f"Locked {len(lines)} packages to {lock_path}")
 
 if __name__ == "__main__":
-    app = QApplication(sys.argv)
+    parser = argparse.ArgumentParser(description='Run the sound shift experiment.')
+    parser.add_argument('--profile-startup', action='store_true', help='Print how long each startup step takes')
+    parser.add_argument('--lock', action='store_true', help='Pin the installed package versions to requirements.lock and exit')
+    args, qt_args = parser.parse_known_args()
+
+    if args.lock:
+        write_lock()
+        sys.exit(0)
+
+    timings = []
+    step_start = launch = perf_counter()
+
+    def mark(step):
+        global step_start
+        now = perf_counter()
+        timings.append((step, now - step_start))
+        step_start = now
+
+    missing, mismatched = check_dependencies()
+    for package, locked, version in mismatched:
+        print(f"Warning: {package} {version} is installed, but requirements.lock pins {locked}")
+    if missing:
+        print(f"Missing packages: {', '.join(missing)}")
+        print(f"Install them with: {sys.executable} -m pip install -r {requirements_path}")
+        print(f"(Only the experiment's packages are checked; the analysis scripts also need {', '.join(analysis_packages)}.)")
+        sys.exit(1)
+    mark('dependency check')
+
+    # Import the GUI only once the dependencies are known to be there.
+    # sounddevice itself is imported when the first sound plays.
+    from PyQt5.QtWidgets import QApplication
+    from PyQt5.QtCore import QTimer
+    mark('import PyQt5')
+    app = QApplication([sys.argv[0]] + qt_args)
+    mark('create QApplication')
+    from experiment import UserDataWindow
+    mark('import experiment')
 
     # Initialize and show the user data collection window
     user_data_window = UserDataWindow()
     user_data_window.show()
+    mark('show consent window')
+
+    if args.profile_startup:
+        def report():
+            # Runs once the event loop has drawn the window
+            mark('first event loop pass')
+            for step, seconds in timings:
+                print(f"{step:<24} {seconds * 1000:8.1f} ms")
+            print(f"{'total':<24} {(perf_counter() - launch) * 1000:8.1f} ms")
+        QTimer.singleShot(0, report)
 
-    sys.exit(app.exec_())
\ No newline at end of file
+    sys.exit(app.exec_())
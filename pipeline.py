@@ -0,0 +1,245 @@
+import os
+import sys
+import json
+import argparse
+import tempfile
+from time import perf_counter
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from analyse import calculate_signal_detection_metrics, format_report_sdt, group_summary
+
+raw_data_dir = os.path.join(os.path.dirname(__file__), 'raw_data')
+reports_dir = os.path.join(os.path.dirname(__file__), 'reports')
+csv_ana_dir = os.path.join(os.path.dirname(__file__), 'csv_ana')
+
+# Direction and speed are coded as small integers; -1 is 'NIL' (no change, or no answer)
+direction_codes = {'left': 0, 'right': 1}
+speed_codes = {'fast': 0, 'slow': 1}
+
+
+def parse_session(data):
+    """
+    Parse a user_data session into typed arrays, one entry per response.
+
+    Returns a dictionary of numpy arrays: frequency (int64), trial_direction, trial_speed,
+    direction and speed (int8 codes, -1 for 'NIL') and change_detected (int8: 1, 0, or -1
+    if the question was never answered).
+    """
+    responses = data['responses']
+    trial_direction, trial_speed, direction, speed, change_detected = [], [], [], [], []
+    for response in responses:
+        trial_sound = response.get('trial_sound', 'NIL')
+        if trial_sound != 'constant' and trial_sound != 'NIL':
+            presented_direction, presented_speed = trial_sound.split('_')
+        else:
+            presented_direction, presented_speed = 'NIL', 'NIL'
+        trial_direction.append(direction_codes.get(presented_direction, -1))
+        trial_speed.append(speed_codes.get(presented_speed, -1))
+        direction.append(direction_codes.get(response.get('direction'), -1))
+        speed.append(speed_codes.get(response.get('speed'), -1))
+        change_detected.append({True: 1, False: 0}.get(response.get('change_detected'), -1))
+
+    return {
+        'frequency': np.array([response.get('frequency', -1) for response in responses], dtype=np.int64),
+        'trial_direction': np.array(trial_direction, dtype=np.int8),
+        'trial_speed': np.array(trial_speed, dtype=np.int8),
+        'direction': np.array(direction, dtype=np.int8),
+        'speed': np.array(speed, dtype=np.int8),
+        'change_detected': np.array(change_detected, dtype=np.int8),
+    }
+
+def _mean_percent(values, mask):
+    # Percentage of True values under mask (0 if the mask is empty), like groupby().mean() * 100
+    count = np.count_nonzero(mask)
+    return float(np.count_nonzero(values & mask) / count * 100) if count else 0.0
+
+def sdt_metrics(trials):
+    """
+    Compute the same metrics as analyse.compute_sdt_metrics from parsed session arrays.
+    """
+    trial_direction = trials['trial_direction']
+    trial_speed = trials['trial_speed']
+    detected = trials['change_detected'] == 1
+    actual_change = trial_direction >= 0
+    no_change = ~actual_change
+
+    actual_count = int(np.count_nonzero(actual_change))
+    no_change_count = int(np.count_nonzero(no_change))
+    hits = int(np.count_nonzero(actual_change & detected))
+    misses = actual_count - hits
+    false_alarms = int(np.count_nonzero(no_change & detected))
+    correct_rejections = no_change_count - false_alarms
+
+    hit_rate = hits / (hits + misses) if (hits + misses) > 0 else 0
+    false_alarm_rate = false_alarms / (false_alarms + correct_rejections) if (false_alarms + correct_rejections) > 0 else 0
+    d_prime, beta = calculate_signal_detection_metrics(hit_rate, false_alarm_rate)
+
+    direction_correct = np.count_nonzero(actual_change & (trial_direction == trials['direction']))
+    speed_correct = np.count_nonzero(actual_change & (trial_speed == trials['speed']))
+
+    return {
+        'trials': len(trial_direction),
+        'hits': hits,
+        'misses': misses,
+        'false_alarms': false_alarms,
+        'correct_rejections': correct_rejections,
+        'hit_rate': float(hit_rate),
+        'false_alarm_rate': float(false_alarm_rate),
+        'd_prime': float(d_prime),
+        'beta': float(beta),
+        'correct_detection_rate': hits / actual_count * 100 if actual_count > 0 else 0,
+        'false_positive_rate': false_alarms / no_change_count * 100 if no_change_count > 0 else 0,
+        'direction_bias_left': _mean_percent(detected, actual_change & (trial_direction == direction_codes['left'])),
+        'direction_bias_right': _mean_percent(detected, actual_change & (trial_direction == direction_codes['right'])),
+        'speed_influence_fast': _mean_percent(detected, actual_change & (trial_speed == speed_codes['fast'])),
+        'speed_influence_slow': _mean_percent(detected, actual_change & (trial_speed == speed_codes['slow'])),
+        'direction_accuracy_rate': direction_correct / actual_count * 100 if actual_count > 0 else 0,
+        'speed_accuracy_rate': speed_correct / actual_count * 100 if actual_count > 0 else 0,
+    }
+
+def frequency_points(trials):
+    """
+    Compute the per-frequency points of csv_analysis.score_points from parsed session arrays.
+    Returns (frequencies, points, as_float); as_float tells whether the original scoring
+    would have written the points as floats.
+    """
+    frequencies, group = np.unique(trials['frequency'], return_inverse=True)
+    trial_direction = trials['trial_direction']
+    direction = trials['direction']
+    detected = trials['change_detected'] == 1
+
+    half = (trial_direction >= 0) & detected
+    other = ~half & ~((trial_direction < 0) & detected)
+    left_correct = (trial_direction == direction_codes['left']) & (direction == direction_codes['left'])
+    right_correct = (trial_direction == direction_codes['right']) & (direction == direction_codes['right'])
+
+    count = lambda mask: np.bincount(group, weights=mask, minlength=len(frequencies))
+    half_count = count(half)
+    both_correct = (count(left_correct) > 0) & (count(right_correct) > 0)
+    points = 0.5 * half_count + 3 * count(other) * both_correct
+    points[points < 1] = 0
+    as_float = bool((half_count > 0).any() and (points >= 1).any())
+    return frequencies, points, as_float
+
+def analyze_session(job):
+    """
+    Parse one raw session and write its SDT report and points file. Runs in a worker process.
+    Returns (participant, metrics dictionary, or None and an error message).
+    """
+    json_path, reports_folder, points_folder = job
+    participant = os.path.splitext(os.path.basename(json_path))[0]
+    try:
+        with open(json_path, 'r') as f:
+            trials = parse_session(json.load(f))
+    except (OSError, ValueError, KeyError, TypeError, AttributeError) as error:
+        return participant, None, f'{type(error).__name__}: {error}'
+
+    metrics = sdt_metrics(trials)
+    with open(os.path.join(reports_folder, f'{participant}_report.txt'), 'w') as report_file:
+        report_file.write(format_report_sdt(f'{participant}.csv', metrics))
+
+    frequencies, points, as_float = frequency_points(trials)
+    lines = ['frequency,points']
+    lines += [f'{frequency},{float(value) if as_float else int(value)}' for frequency, value in zip(frequencies, points)]
+    with open(os.path.join(points_folder, f'{participant}.csv'), 'w') as points_file:
+        points_file.write('\n'.join(lines) + '\n')
+
+    return participant, metrics, None
+
+def run_pipeline(raw_folder=raw_data_dir, reports_folder=reports_dir, points_folder=csv_ana_dir, workers=None):
+    """
+    Analyse every raw session in one pass: each JSON file is parsed once into typed arrays,
+    from which the per-participant SDT report (reports/) and per-frequency points (csv_ana/)
+    are written, followed by sdt_results.csv and sdt_group_summary.csv.
+
+    Parameters:
+    raw_folder: Folder of user_data JSON sessions.
+    reports_folder: Output folder for the text reports and the results tables.
+    points_folder: Output folder for the points files.
+    workers: Number of worker processes (defaults to the number of CPUs; 1 runs in-process).
+
+    Returns (results DataFrame, {participant: error message} for sessions that failed).
+    """
+    os.makedirs(reports_folder, exist_ok=True)
+    os.makedirs(points_folder, exist_ok=True)
+    jobs = [
+        (os.path.join(raw_folder, name), reports_folder, points_folder)
+        for name in sorted(os.listdir(raw_folder))
+        if name.endswith('.json')
+    ]
+
+    if workers == 1 or len(jobs) <= 1:
+        outcomes = [analyze_session(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            outcomes = list(executor.map(analyze_session, jobs))
+
+    results = pd.DataFrame([{'participant': participant, **metrics} for participant, metrics, _ in outcomes if metrics is not None])
+    failed = {participant: error for participant, metrics, error in outcomes if metrics is None}
+    if len(results):
+        results.to_csv(os.path.join(reports_folder, 'sdt_results.csv'), index=False)
+        group_summary(results).to_csv(os.path.join(reports_folder, 'sdt_group_summary.csv'))
+    return results, failed
+
+def verify(raw_folder=raw_data_dir, workers=None):
+    """
+    Run the CSV-based chain (csv_generator -> analyse and csv_analysis) and this pipeline on
+    the same raw sessions in a temporary folder and compare every output file.
+    Returns (names of differing files, CSV chain seconds, pipeline seconds).
+    """
+    import csv_generator
+    import analyse
+    import csv_analysis
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = lambda *parts: os.path.join(temp_dir, *parts)
+
+        start = perf_counter()
+        csv_generator.json_to_csv(raw_folder, path('csv_data'), workers=workers, force=True)
+        analyse.process_folder_sdt(path('csv_data'), path('chain', 'reports'), workers=workers)
+        csv_analysis.main(path('csv_data'), path('chain', 'csv_ana'))
+        chain_seconds = perf_counter() - start
+
+        start = perf_counter()
+        run_pipeline(raw_folder, path('pipeline', 'reports'), path('pipeline', 'csv_ana'), workers=workers)
+        pipeline_seconds = perf_counter() - start
+
+        mismatches = []
+        for folder in ('reports', 'csv_ana'):
+            expected = sorted(os.listdir(path('chain', folder)))
+            if expected != sorted(os.listdir(path('pipeline', folder))):
+                mismatches.append(f'{folder}/ (different file lists)')
+            for name in expected:
+                actual_path = path('pipeline', folder, name)
+                if name.endswith('.csv') and name.startswith('sdt_'):
+                    # Results tables: compare the numbers, not the last digit of their text
+                    same = os.path.exists(actual_path) and np.allclose(
+                        pd.read_csv(path('chain', folder, name)).select_dtypes('number'),
+                        pd.read_csv(actual_path).select_dtypes('number'), equal_nan=True)
+                else:
+                    with open(path('chain', folder, name), 'rb') as f:
+                        expected_bytes = f.read()
+                    same = os.path.exists(actual_path) and open(actual_path, 'rb').read() == expected_bytes
+                if not same:
+                    mismatches.append(f'{folder}/{name}')
+    return mismatches, chain_seconds, pipeline_seconds
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Analyse the raw sessions in one pass, without the CSV intermediate.')
+    parser.add_argument('--workers', type=int, default=None, help='Number of worker processes (default: all CPUs)')
+    parser.add_argument('--verify', action='store_true', help='Compare against the CSV-based chain in a temporary folder instead')
+    args = parser.parse_args()
+
+    if args.verify:
+        mismatches, chain_seconds, pipeline_seconds = verify(workers=args.workers)
+        for name in mismatches:
+            print(f"MISMATCH {name}")
+        print(f"CSV chain {chain_seconds:.3f} s, pipeline {pipeline_seconds:.3f} s ({chain_seconds / pipeline_seconds:.1f}x)")
+        sys.exit(1 if mismatches else 0)
+
+    start = perf_counter()
+    results, failed = run_pipeline(workers=args.workers)
+    for participant, error in failed.items():
+        print(f"FAILED {participant}: {error}")
+    print(f"Analysed {len(results)} sessions in {perf_counter() - start:.3f} s")
@@ -5,15 +5,16 @@ from PyQt5.QtWidgets import (
 )
 from PyQt5.QtCore import Qt
 from PyQt5.QtGui import QIntValidator
-from sound import SoundGenerator
+from sound import SoundGenerator, get_engine
 import math
 
 class SoundControlApp(QWidget):
     def __init__(self):
         super().__init__()
 
-        # Initialize the sound generator
+        # Initialize the sound generator; it is played on the shared audio engine
         self.sound_generator = SoundGenerator()
+        self.playback = None
         self.is_playing = False
 
         # Initialize current frequency
@@ -89,11 +90,13 @@ class SoundControlApp(QWidget):
     def start_sound(self):
         self.is_playing = True
         self.update_sound()  # Update properties before starting
-        self.sound_generator.start_sound()
+        self.playback = get_engine().play(self.sound_generator)
 
     def stop_sound(self):
         self.is_playing = False
-        self.sound_generator.stop_sound()
+        if self.playback is not None:
+            self.playback.cancel()
+            self.playback = None
 
     def update_sound(self):
         if self.is_playing:
@@ -109,8 +112,9 @@ class SoundControlApp(QWidget):
             # Update phase label
             self.phase_label.setText(f'Phase Difference: {phase_diff}°')
 
-            # Update the sound properties for real-time adjustment
-            self.sound_generator.update_sound_properties(self.current_frequency, left_amp, right_amp, phase_diff)
+            # Publish the sound properties to the audio thread as one snapshot;
+            # it picks up the latest one per block and smooths the change
+            self.sound_generator.publish(self.current_frequency, left_amp, right_amp, phase_diff)
 
     def update_frequency_from_slider(self):
         # Apply exponential scaling
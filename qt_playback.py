@@ -0,0 +1,19 @@
+from PyQt5.QtCore import QObject, pyqtSignal
+
+
+class PlaybackNotifier(QObject):
+    """
+    Re-emits the completion of a background PlaybackHandle as a Qt signal.
+
+    Done callbacks run on the handle's watcher thread; emitting a signal from there is
+    delivered to connected slots through the receiver's event loop, so slots run on the
+    GUI thread.
+    """
+    finished = pyqtSignal(object)  # Emits the PlaybackHandle that finished
+
+    def watch(self, handle):
+        """
+        Emit finished(handle) once the given playback handle is done.
+        """
+        handle.add_done_callback(self.finished.emit)
+        return handle
@@ -0,0 +1,41 @@
+import os
+from PyQt5.QtGui import QPixmap
+
+resources_dir = os.path.join(os.path.dirname(__file__), 'resources')
+
+
+class PixmapCache:
+    """
+    Decodes every PNG icon in resources/ once and hands out the same QPixmap objects.
+
+    QPixmaps are implicitly shared, so setting one on several labels or windows copies
+    nothing. Icons are looked up by file name without the extension, e.g. 'yes-on'.
+    """
+    def __init__(self, directory=resources_dir):
+        self.directory = directory
+        self.pixmaps = {}
+        for file_name in sorted(os.listdir(directory)):
+            if file_name.endswith('.png'):
+                pixmap = QPixmap(os.path.join(directory, file_name))
+                if pixmap.isNull():
+                    raise OSError(f"Could not decode icon {file_name}")
+                self.pixmaps[file_name[:-len('.png')]] = pixmap
+
+    def __getitem__(self, name):
+        return self.pixmaps[name]
+
+    def __len__(self):
+        return len(self.pixmaps)
+
+
+_pixmaps = None
+
+def get_pixmaps():
+    """
+    Return the PixmapCache shared by all windows, decoding the icons on first use.
+    Needs a QApplication to exist, so call it from a window's constructor.
+    """
+    global _pixmaps
+    if _pixmaps is None:
+        _pixmaps = PixmapCache()
+    return _pixmaps
@@ -0,0 +1,125 @@
+import os
+import json
+import wave
+import hashlib
+import argparse
+from time import perf_counter
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import shift as sft
+from stimulus_bank import StimulusBank, default_cache_dir
+
+
+def file_sha256(file_path):
+    # Hash the file in chunks so large stimuli are not read into memory twice
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def write_wav(file_path, buffer, sample_rate):
+    """
+    Write a (frames, 2) float buffer as a 16-bit PCM stereo WAV file.
+    """
+    pcm = (np.clip(buffer, -1.0, 1.0) * 32767).astype('<i2')
+    with wave.open(file_path, 'wb') as wav_file:
+        wav_file.setnchannels(2)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes(pcm.tobytes())
+
+def render_one(job):
+    """
+    Render a single stimulus to the requested file formats and return its manifest entry.
+    Runs in a worker process.
+    """
+    sound, freq, output_dir, formats, sample_rate, cache_dir = job
+    mode, direction, shift = sft.trial_sounds[sound]
+
+    start = perf_counter()
+    if cache_dir is not None:
+        # Also store the buffer in the stimulus bank cache so the experiment starts warm
+        buffer = StimulusBank(cache_dir=cache_dir, max_bytes=0, sample_rate=sample_rate).get(freq, mode, direction, shift)
+    else:
+        buffer = sft.render_sound_shift(freq, mode, direction, shift, sample_rate)
+
+    files = {}
+    base_name = f'{sound}_{freq}Hz'
+    if 'npy' in formats:
+        npy_path = os.path.join(output_dir, f'{base_name}.npy')
+        np.save(npy_path, buffer)
+        files['npy'] = {'path': os.path.basename(npy_path), 'sha256': file_sha256(npy_path)}
+    if 'wav' in formats:
+        wav_path = os.path.join(output_dir, f'{base_name}.wav')
+        write_wav(wav_path, buffer, sample_rate)
+        files['wav'] = {'path': os.path.basename(wav_path), 'sha256': file_sha256(wav_path)}
+
+    return {
+        'sound': sound,
+        'frequency': freq,
+        'mode': mode,
+        'direction': direction,
+        'shift': shift,
+        'sample_rate': sample_rate,
+        'frames': len(buffer),
+        'peak': float(np.abs(buffer).max()),
+        'render_seconds': perf_counter() - start,
+        'files': files,
+    }
+
+def render_trial_grid(output_dir, formats=('wav', 'npy'), sample_rate=44100, workers=None, cache_dir=None):
+    """
+    Render every stimulus in the experiment's trial grid (shift.trial_frequencies x
+    shift.trial_sounds) across a process pool and write manifest.json next to the files.
+
+    Parameters:
+    output_dir: Directory for the rendered files and the manifest.
+    formats: File formats to write ('wav' for 16-bit PCM, 'npy' for the exact float32 buffer).
+    sample_rate: Sample rate to render at.
+    workers: Number of worker processes (defaults to the number of CPUs).
+    cache_dir: If given, also store each buffer in this stimulus bank cache directory.
+
+    Returns the manifest as a dictionary.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    jobs = [
+        (sound, freq, output_dir, tuple(formats), sample_rate, cache_dir)
+        for sound in sft.trial_sounds
+        for freq in sft.trial_frequencies
+    ]
+
+    start = perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        stimuli = list(executor.map(render_one, jobs))
+    elapsed = perf_counter() - start
+
+    manifest = {
+        'sample_rate': sample_rate,
+        'formats': list(formats),
+        'stimulus_count': len(stimuli),
+        'render_seconds': elapsed,
+        'stimuli': stimuli,
+    }
+    with open(os.path.join(output_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=4)
+    return manifest
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Render every trial stimulus to WAV/NPY files without a sound card.')
+    parser.add_argument('--output-dir', default=os.path.join(os.path.dirname(__file__), 'rendered_stimuli'))
+    parser.add_argument('--format', choices=['wav', 'npy', 'both'], default='both')
+    parser.add_argument('--sample-rate', type=int, default=44100)
+    parser.add_argument('--workers', type=int, default=None, help='Number of worker processes (default: all CPUs)')
+    parser.add_argument('--prestage', action='store_true', help='Also fill the stimulus bank cache used by the experiment')
+    args = parser.parse_args()
+
+    formats = ('wav', 'npy') if args.format == 'both' else (args.format,)
+    manifest = render_trial_grid(
+        args.output_dir,
+        formats=formats,
+        sample_rate=args.sample_rate,
+        workers=args.workers,
+        cache_dir=default_cache_dir if args.prestage else None,
+    )
+    print(f"Rendered {manifest['stimulus_count']} stimuli in {manifest['render_seconds']:.2f} s to {args.output_dir}")
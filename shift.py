@@ -1,33 +1,30 @@
-from sound import SoundGenerator
-import numpy as np
-import time
+from sound import SoundGenerator, Automation, get_engine
 
-def phase_shift_sound(frequency, start_deg, stop_deg, time_interval, total_time):
+def play_stimulus(sound_gen, automation, wait=True):
     """
-    Generates a sound with a given frequency, starting at start_deg phase and linearly
-    shifting to stop_deg phase over time_interval seconds, within the total_time duration,
-    with the volume reduced to 50%.
-    
-    Parameters:
-    frequency: Frequency of the sound in Hz.
-    start_deg: Initial phase in degrees.
-    stop_deg: Final phase in degrees.
-    time_interval: Duration of the phase shift in seconds.
-    total_time: Total time for the sound to play (must be greater than time_interval).
+    Queues a stimulus on the shared audio engine and returns its PlaybackHandle.
+    If wait is True, returns only once the sound has finished.
+    """
+    handle = get_engine().play(sound_gen, automation)
+    if wait:
+        handle.wait()
+    return handle
+
+def phase_shift_stimulus(frequency, start_deg, stop_deg, time_interval, total_time, sample_rate=44100):
+    """
+    Builds the sound generator and automation timeline for a phase shift stimulus
+    (see phase_shift_sound) without playing it.
+
+    Returns a (SoundGenerator, Automation) pair.
     """
     if total_time <= time_interval:
         raise ValueError("total_time must be greater than time_interval")
 
-    # Create the sound generator
-    sound_gen = SoundGenerator()
-
-    # Convert degrees to radians for starting and stopping phase
-    start_phase_rad = np.deg2rad(start_deg)
-    stop_phase_rad = np.deg2rad(stop_deg)
+    # Create the sound generator (rendered by the shared audio engine, which owns the stream)
+    sound_gen = SoundGenerator(sample_rate)
 
     # Calculate the time before and after the phase change
     pre_phase_time = (total_time - time_interval) / 2
-    post_phase_time = total_time - pre_phase_time - time_interval
 
     # Number of frames for the entire sound duration
     total_frames = int(sound_gen.sample_rate * total_time)
@@ -36,64 +33,44 @@ def phase_shift_sound(frequency, start_deg, stop_deg, time_interval, total_time)
     start_phase_frame = int(sound_gen.sample_rate * pre_phase_time)
     stop_phase_frame = start_phase_frame + int(sound_gen.sample_rate * time_interval)
 
-    # Phase difference step per frame
-    phase_step = (stop_phase_rad - start_phase_rad) / (stop_phase_frame - start_phase_frame)
-
-    # Initialize phase difference
-    current_phase = start_phase_rad
-
-    # Start sound generation
-    sound_gen.update_sound_properties(frequency, 0.5, 0.5, np.rad2deg(current_phase))  # 50% volume initially
-    sound_gen.start_sound()
-
-    # Get the start time
-    start_time = time.time()
-
-    for frame in range(total_frames):
-        # Determine the phase for this frame
-        if frame < start_phase_frame:
-            # Before phase shift, use start phase, 50% volume
-            current_phase = start_phase_rad
-        elif start_phase_frame <= frame <= stop_phase_frame:
-            # During phase shift, update the phase linearly, 50% volume
-            current_phase = start_phase_rad + (frame - start_phase_frame) * phase_step
-        else:
-            # After phase shift, use stop phase, 50% volume
-            current_phase = stop_phase_rad
-
-        # Update the sound properties with the current phase and reduced volume (50%)
-        sound_gen.update_sound_properties(frequency, 0.5, 0.5, np.rad2deg(current_phase))
+    # Hold start_deg, ramp linearly to stop_deg, then hold stop_deg
+    automation = Automation(total_frames, phase_diff=[(start_phase_frame, start_deg), (stop_phase_frame, stop_deg)])
 
-        # Calculate how long we need to wait to maintain real-time playback
-        elapsed_time = time.time() - start_time
-        target_time = (frame + 1) / sound_gen.sample_rate
-        sleep_time = target_time - elapsed_time
+    # 50% volume throughout
+    sound_gen.update_sound_properties(frequency, 0.5, 0.5, start_deg)
+    return sound_gen, automation
 
-        if sleep_time > 0:
-            time.sleep(sleep_time)
-
-    # Ensure the sound stops after the total time
-    sound_gen.stop_sound()
-
-def volume_shift_sound_precise(frequency, start_left_vol, stop_left_vol, start_right_vol, stop_right_vol, time_interval, total_time):
+def phase_shift_sound(frequency, start_deg, stop_deg, time_interval, total_time, wait=True):
     """
-    Generates a sound with a given frequency, changing the left and right volumes over time_interval seconds,
-    within the total_time duration.
-
+    Generates a sound with a given frequency, starting at start_deg phase and linearly
+    shifting to stop_deg phase over time_interval seconds, within the total_time duration,
+    with the volume reduced to 50%.
+    
     Parameters:
     frequency: Frequency of the sound in Hz.
-    start_left_vol: Initial left volume (0.0 to 1.0).
-    stop_left_vol: Final left volume (0.0 to 1.0).
-    start_right_vol: Initial right volume (0.0 to 1.0).
-    stop_right_vol: Final right volume (0.0 to 1.0).
-    time_interval: Duration of the volume change in seconds.
+    start_deg: Initial phase in degrees.
+    stop_deg: Final phase in degrees.
+    time_interval: Duration of the phase shift in seconds.
     total_time: Total time for the sound to play (must be greater than time_interval).
+    wait: Block until the sound has finished. If False, return immediately.
+
+    Returns a PlaybackHandle for the sound.
+    """
+    sound_gen, automation = phase_shift_stimulus(frequency, start_deg, stop_deg, time_interval, total_time)
+    return play_stimulus(sound_gen, automation, wait)
+
+def volume_shift_stimulus_precise(frequency, start_left_vol, stop_left_vol, start_right_vol, stop_right_vol, time_interval, total_time, sample_rate=44100):
+    """
+    Builds the sound generator and automation timeline for a volume shift stimulus
+    (see volume_shift_sound_precise) without playing it.
+
+    Returns a (SoundGenerator, Automation) pair.
     """
     if total_time <= time_interval:
         raise ValueError("total_time must be greater than time_interval")
 
-    # Create the sound generator
-    sound_gen = SoundGenerator()
+    # Create the sound generator (rendered by the shared audio engine, which owns the stream)
+    sound_gen = SoundGenerator(sample_rate)
 
     # Number of frames for the entire sound duration
     total_frames = int(sound_gen.sample_rate * total_time)
@@ -102,51 +79,60 @@ def volume_shift_sound_precise(frequency, start_left_vol, stop_left_vol, start_r
     start_vol_frame = int(sound_gen.sample_rate * (total_time - time_interval) / 2)
     stop_vol_frame = start_vol_frame + int(sound_gen.sample_rate * time_interval)
 
-    # Volume step per frame for left and right channels
-    left_vol_step = (stop_left_vol - start_left_vol) / (stop_vol_frame - start_vol_frame)
-    right_vol_step = (stop_right_vol - start_right_vol) / (stop_vol_frame - start_vol_frame)
+    # Hold the start volumes, ramp linearly to the stop volumes, then hold the stop volumes
+    automation = Automation(
+        total_frames,
+        left_amp=[(start_vol_frame, start_left_vol), (stop_vol_frame, stop_left_vol)],
+        right_amp=[(start_vol_frame, start_right_vol), (stop_vol_frame, stop_right_vol)],
+    )
 
-    # Initialize left and right volumes
-    left_vol = start_left_vol
-    right_vol = start_right_vol
+    sound_gen.update_sound_properties(frequency, start_left_vol, start_right_vol, 0)  # Start with initial volumes
+    return sound_gen, automation
 
-    # Start sound generation
-    sound_gen.update_sound_properties(frequency, left_vol, right_vol, 0)  # Start with initial volumes
-    sound_gen.start_sound()
-
-    # Get the start time
-    start_time = time.time()
+def volume_shift_sound_precise(frequency, start_left_vol, stop_left_vol, start_right_vol, stop_right_vol, time_interval, total_time, wait=True):
+    """
+    Generates a sound with a given frequency, changing the left and right volumes over time_interval seconds,
+    within the total_time duration.
 
-    for frame in range(total_frames):
-        # Determine the volumes for this frame
-        if frame < start_vol_frame:
-            # Before volume shift, use start volumes
-            left_vol = start_left_vol
-            right_vol = start_right_vol
-        elif start_vol_frame <= frame <= stop_vol_frame:
-            # During volume shift, update the volumes linearly
-            left_vol = start_left_vol + (frame - start_vol_frame) * left_vol_step
-            right_vol = start_right_vol + (frame - start_vol_frame) * right_vol_step
-        else:
-            # After volume shift, use stop volumes
-            left_vol = stop_left_vol
-            right_vol = stop_right_vol
+    Parameters:
+    frequency: Frequency of the sound in Hz.
+    start_left_vol: Initial left volume (0.0 to 1.0).
+    stop_left_vol: Final left volume (0.0 to 1.0).
+    start_right_vol: Initial right volume (0.0 to 1.0).
+    stop_right_vol: Final right volume (0.0 to 1.0).
+    time_interval: Duration of the volume change in seconds.
+    total_time: Total time for the sound to play (must be greater than time_interval).
+    wait: Block until the sound has finished. If False, return immediately.
 
-        # Update the sound properties with the current volumes
-        sound_gen.update_sound_properties(frequency, left_vol, right_vol, 0)
+    Returns a PlaybackHandle for the sound.
+    """
+    sound_gen, automation = volume_shift_stimulus_precise(frequency, start_left_vol, stop_left_vol, start_right_vol, stop_right_vol, time_interval, total_time)
+    return play_stimulus(sound_gen, automation, wait)
 
-        # Calculate how long we need to wait to maintain real-time playback
-        elapsed_time = time.time() - start_time
-        target_time = (frame + 1) / sound_gen.sample_rate
-        sleep_time = target_time - elapsed_time
+def volume_to_channel_levels(start_vol, stop_vol):
+    """
+    Converts a start and stop volume balance (-100 to 100) into
+    (start_left_vol, stop_left_vol, start_right_vol, stop_right_vol) levels (0.0 to 1.0).
+    """
+    start_vol = 0 - start_vol
+    stop_vol = 0 - stop_vol
+    start_left_vol = (start_vol + 100) / 200
+    stop_left_vol = (stop_vol + 100) / 200
+    start_right_vol = 1 - start_left_vol
+    stop_right_vol = 1 - stop_left_vol
+    return start_left_vol, stop_left_vol, start_right_vol, stop_right_vol
 
-        if sleep_time > 0:
-            time.sleep(sleep_time)
+def volume_shift_stimulus(frequency, start_vol, stop_vol, time_interval, total_time, sample_rate=44100):
+    """
+    Builds the sound generator and automation timeline for a volume shift stimulus
+    (see volume_shift_sound) without playing it.
 
-    # Ensure the sound stops after the total time
-    sound_gen.stop_sound()
+    Returns a (SoundGenerator, Automation) pair.
+    """
+    start_left_vol, stop_left_vol, start_right_vol, stop_right_vol = volume_to_channel_levels(start_vol, stop_vol)
+    return volume_shift_stimulus_precise(frequency, start_left_vol, stop_left_vol, start_right_vol, stop_right_vol, time_interval, total_time, sample_rate)
 
-def volume_shift_sound(frequency, start_vol, stop_vol, time_interval, total_time):
+def volume_shift_sound(frequency, start_vol, stop_vol, time_interval, total_time, wait=True):
     """
     Generates a sound with a given frequency, changing the volume over time_interval seconds,
     within the total_time duration.
@@ -157,16 +143,13 @@ def volume_shift_sound(frequency, start_vol, stop_vol, time_interval, total_time
     stop_vol: Final volume (-100 to 100).
     time_interval: Duration of the volume change in seconds.
     total_time: Total time for the sound to play (must be greater than time_interval).
-    """
+    wait: Block until the sound has finished. If False, return immediately.
 
-    start_vol = 0 - start_vol
-    stop_vol = 0 - stop_vol
-    start_left_vol = (start_vol + 100) / 200
-    stop_left_vol = (stop_vol + 100) / 200
-    start_right_vol = 1 - start_left_vol
-    stop_right_vol = 1 - stop_left_vol
+    Returns a PlaybackHandle for the sound.
+    """
 
-    volume_shift_sound_precise(frequency, start_left_vol, stop_left_vol, start_right_vol, stop_right_vol, time_interval, total_time)
+    start_left_vol, stop_left_vol, start_right_vol, stop_right_vol = volume_to_channel_levels(start_vol, stop_vol)
+    return volume_shift_sound_precise(frequency, start_left_vol, stop_left_vol, start_right_vol, stop_right_vol, time_interval, total_time, wait)
 
 max_deg = 150 # Don't change this value
 max_vol = 35 # Don't change this value
@@ -174,54 +157,111 @@ short_time = 3 # Don't change this value
 long_time = 9 # Don't change this value
 full_time = 10 # Don't change this value
 
+# Trial grid used by the experiment: every frequency is tested with each sound below
+trial_frequencies = list(range(0, 2050, 50))
+trial_sounds = {
+    'left_fast': ('phase', 'left', 'short'),
+    'left_slow': ('phase', 'left', 'long'),
+    'right_fast': ('phase', 'right', 'short'),
+    'right_slow': ('phase', 'right', 'long'),
+    'constant': ('flat', 'left', 'short'),
+}
 
-def short_left_phase_shift(freq):
+
+def short_left_phase_shift(freq, wait=True):
     """
     Generates a short sound with a phase shift from left to right.
     """
-    phase_shift_sound(freq, 0, -max_deg, short_time, full_time)
+    return phase_shift_sound(freq, 0, -max_deg, short_time, full_time, wait)
 
-def short_right_phase_shift(freq):
+def short_right_phase_shift(freq, wait=True):
     """
     Generates a short sound with a phase shift from right to left.
     """
-    phase_shift_sound(freq, 0, max_deg, short_time, full_time)
+    return phase_shift_sound(freq, 0, max_deg, short_time, full_time, wait)
 
-def short_left_volume_shift(freq):
+def short_left_volume_shift(freq, wait=True):
     """
     Generates a short sound with a volume shift from left to right.
     """
-    volume_shift_sound(freq, 0, -max_vol, short_time, full_time)
+    return volume_shift_sound(freq, 0, -max_vol, short_time, full_time, wait)
 
-def short_right_volume_shift(freq):
+def short_right_volume_shift(freq, wait=True):
     """
     Generates a short sound with a volume shift from right to left.
     """
-    volume_shift_sound(freq, 0, max_vol, short_time, full_time)
+    return volume_shift_sound(freq, 0, max_vol, short_time, full_time, wait)
 
-def long_left_phase_shift(freq):
+def long_left_phase_shift(freq, wait=True):
     """
     Generates a long sound with a phase shift from left to right.
     """
-    phase_shift_sound(freq, 0, -max_deg, long_time, full_time)
+    return phase_shift_sound(freq, 0, -max_deg, long_time, full_time, wait)
 
-def long_right_phase_shift(freq):
+def long_right_phase_shift(freq, wait=True):
     """
     Generates a long sound with a phase shift from right to left.
     """
-    phase_shift_sound(freq, 0, max_deg, long_time, full_time)
+    return phase_shift_sound(freq, 0, max_deg, long_time, full_time, wait)
 
-def long_left_volume_shift(freq):
+def long_left_volume_shift(freq, wait=True):
     """
     Generates a long sound with a volume shift from left to right.
     """
-    volume_shift_sound(freq, 0, -max_vol, long_time, full_time)
+    return volume_shift_sound(freq, 0, -max_vol, long_time, full_time, wait)
 
-def long_right_volume_shift(freq):
+def long_right_volume_shift(freq, wait=True):
     """
     Generates a long sound with a volume shift from right to left.
     """
-    volume_shift_sound(freq, 0, max_vol, long_time, full_time)
+    return volume_shift_sound(freq, 0, max_vol, long_time, full_time, wait)
+
+def shift_stimulus(freq=440, mode='phase', direction='left', shift='short', sample_rate=44100):
+    """
+    Builds the sound generator and automation timeline for a given frequency and shift type
+    (see sound_shift) without playing it.
+
+    Returns a (SoundGenerator, Automation) pair.
+    """
+
+    if mode == 'flat':
+        return phase_shift_stimulus(freq, 0, 0, long_time, full_time, sample_rate)
+    if mode not in ('phase', 'volume'):
+        raise ValueError("Invalid shift mode")
+    if direction not in ('left', 'right'):
+        raise ValueError("Invalid shift direction")
+
+    if shift == 'short':
+        time_interval = short_time
+    elif shift == 'long':
+        time_interval = long_time
+    else:
+        raise ValueError("Invalid shift duration")
+
+    # Left shifts go towards negative phase / balance, right shifts towards positive
+    sign = -1 if direction == 'left' else 1
+
+    if mode == 'phase':
+        return phase_shift_stimulus(freq, 0, sign * max_deg, time_interval, full_time, sample_rate)
+    else:
+        return volume_shift_stimulus(freq, 0, sign * max_vol, time_interval, full_time, sample_rate)
+
+def render_sound_shift(freq=440, mode='phase', direction='left', shift='short', sample_rate=44100):
+    """
+    Renders the sound for a given frequency and shift type offline, without an audio device.
+
+    Returns a (frames, 2) float32 array identical to what the audio engine plays.
+    """
+    sound_gen, automation = shift_stimulus(freq, mode, direction, shift, sample_rate)
+    return sound_gen.render(automation)
+
+def start_sound_shift(freq, mode, direction, shift, wait):
+    """
+    Starts the sound for a given frequency and shift type and returns its PlaybackHandle.
+    If wait is True, returns only once the sound has finished.
+    """
+    sound_gen, automation = shift_stimulus(freq, mode, direction, shift)
+    return play_stimulus(sound_gen, automation, wait)
 
 def sound_shift(freq=440, mode='phase', direction='left', shift='short'):
     """
@@ -234,46 +274,16 @@ def sound_shift(freq=440, mode='phase', direction='left', shift='short'):
     shift: Shift duration ('short' or 'long').
     """
 
-    if mode == 'phase':
-        if direction == 'left':
-            if shift == 'short':
-                short_left_phase_shift(freq)
-            elif shift == 'long':
-                long_left_phase_shift(freq)
-            else:
-                raise ValueError("Invalid shift duration")
-        elif direction == 'right':
-            if shift == 'short':
-                short_right_phase_shift(freq)
-            elif shift == 'long':
-                long_right_phase_shift(freq)
-            else:
-                raise ValueError("Invalid shift duration")
-        else:
-            raise ValueError("Invalid shift direction")
-    elif mode == 'volume':
-        if direction == 'left':
-            if shift == 'short':
-                short_left_volume_shift(freq)
-            elif shift == 'long':
-                long_left_volume_shift(freq)
-            else:
-                raise ValueError("Invalid shift duration")
-        elif direction == 'right':
-            if shift == 'short':
-                short_right_volume_shift(freq)
-            elif shift == 'long':
-                long_right_volume_shift(freq)
-            else:
-                raise ValueError("Invalid shift duration")
-        else:
-            raise ValueError("Invalid shift direction")
-    elif mode == 'flat':
-        phase_shift_sound(freq, 0, 0, long_time, full_time)
-    else:
-        raise ValueError("Invalid shift mode")
+    start_sound_shift(freq, mode, direction, shift, wait=True)
     
     ans = [direction, shift]
     return ans
-    
 
+def sound_shift_async(freq=440, mode='phase', direction='left', shift='short'):
+    """
+    Starts the same sound as sound_shift, but returns immediately.
+
+    Returns a PlaybackHandle that supports add_done_callback(), wait(), cancel() and position().
+    """
+
+    return start_sound_shift(freq, mode, direction, shift, wait=False)
@@ -0,0 +1,169 @@
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import shift as sft
+from sound import BufferSource
+from audio_process import get_playback_engine
+
+# Bump this whenever the synthesis changes so stale cache files are not reused
+# 2: rendering moved to in-place float32 channel math (render_into)
+CACHE_VERSION = 2
+
+default_cache_dir = os.path.join(os.path.dirname(__file__), 'stimulus_cache')
+
+
+class StimulusBank:
+    """
+    Renders each stimulus once and keeps the buffers for reuse.
+
+    Buffers are keyed by (frequency, mode, direction, shift, sample_rate). Recently used
+    buffers are kept in memory up to max_bytes (least recently used are evicted first), and
+    every buffer is also saved to cache_dir as a .npy file so later sessions start warm.
+
+    prefetch() renders a stimulus on a background worker ahead of time, so the get() or
+    play() that follows is just a buffer handoff.
+    """
+    def __init__(self, cache_dir=default_cache_dir, max_bytes=256 * 1024 * 1024, sample_rate=44100):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.sample_rate = sample_rate
+        self.buffers = OrderedDict()
+        self.total_bytes = 0
+        self.pending = {}  # key -> Future of a prefetch in progress
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def key(self, freq, mode='phase', direction='left', shift='short'):
+        """
+        Return the cache key for a stimulus. Flat stimuli ignore direction and shift.
+        """
+        if mode == 'flat':
+            direction, shift = None, None
+        return (freq, mode, direction, shift, self.sample_rate)
+
+    def cache_path(self, key):
+        """
+        Return the on-disk cache file for a key.
+        """
+        freq, mode, direction, shift, sample_rate = key
+        name = '_'.join(str(part) for part in (mode, direction, shift, freq, sample_rate) if part is not None)
+        return os.path.join(self.cache_dir, f'v{CACHE_VERSION}', f'{name}.npy')
+
+    def get(self, freq, mode='phase', direction='left', shift='short'):
+        """
+        Return the rendered (frames, 2) float32 buffer for a stimulus.
+        The buffer is shared and read-only.
+        """
+        key = self.key(freq, mode, direction, shift)
+        with self._lock:
+            if key in self.buffers:
+                self.buffers.move_to_end(key)
+                return self.buffers[key]
+            pending = self.pending.get(key)
+        if pending is not None:
+            # Already being rendered in the background: wait for it rather than rendering twice
+            return pending.result()
+        return self._fetch(key)
+
+    def prefetch(self, freq, mode='phase', direction='left', shift='short'):
+        """
+        Start rendering a stimulus on the background worker so a later get() or play()
+        finds it ready. Does nothing if it is already in memory or being rendered.
+        """
+        key = self.key(freq, mode, direction, shift)
+        with self._lock:
+            if key in self.buffers or key in self.pending:
+                return
+            if self._executor is None:
+                # One worker: prefetches run in order and never compete with each other
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='stimulus-prefetch')
+            future = self._executor.submit(self._fetch, key)
+            self.pending[key] = future
+        # Added outside the lock: the callback runs right away if the future is already done
+        future.add_done_callback(lambda future: self._forget(key, future))
+
+    def _forget(self, key, future):
+        # Drop a finished prefetch, unless a newer one for the same key has replaced it
+        with self._lock:
+            if self.pending.get(key) is future:
+                del self.pending[key]
+
+    def _fetch(self, key):
+        # Load or render a buffer and add it to the in-memory cache
+        freq, mode, direction, shift, _ = key
+        buffer = self._load(key)
+        if buffer is None:
+            buffer = sft.render_sound_shift(freq, mode, direction, shift, self.sample_rate)
+            self._save(key, buffer)
+        buffer.flags.writeable = False
+
+        with self._lock:
+            if key not in self.buffers:
+                self.buffers[key] = buffer
+                self.total_bytes += buffer.nbytes
+                self._evict()
+        return buffer
+
+    def play(self, freq, mode='phase', direction='left', shift='short'):
+        """
+        Queue a stimulus on the shared audio engine (in-process, or the audio process if enabled)
+        and return its PlaybackHandle.
+        """
+        buffer = self.get(freq, mode, direction, shift)
+        return get_playback_engine().play(BufferSource(buffer, self.sample_rate))
+
+    def clear(self):
+        """
+        Drop all in-memory buffers. The on-disk cache is kept.
+        """
+        with self._lock:
+            self.buffers.clear()
+            self.total_bytes = 0
+
+    def _evict(self):
+        # Always keep the most recent buffer, even if it alone exceeds max_bytes
+        while self.total_bytes > self.max_bytes and len(self.buffers) > 1:
+            _, buffer = self.buffers.popitem(last=False)
+            self.total_bytes -= buffer.nbytes
+
+    def _load(self, key):
+        if self.cache_dir is None:
+            return None
+        try:
+            return np.load(self.cache_path(key))
+        except (OSError, ValueError):
+            return None
+
+    def _save(self, key, buffer):
+        if self.cache_dir is None:
+            return
+        path = self.cache_path(key)
+        # Write to a temporary file first so an interrupted save never leaves a truncated cache entry
+        temp_path = f'{path}.{os.getpid()}.tmp'
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(temp_path, 'wb') as f:
+                np.save(f, buffer)
+            os.replace(temp_path, path)
+        except OSError:
+            # An unwritable cache (read-only install, full disk) only costs a re-render next time
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+
+
+_bank = None
+_bank_lock = threading.Lock()
+
+def get_bank():
+    """
+    Return the StimulusBank shared by the whole process, creating it on first use.
+    """
+    global _bank
+    with _bank_lock:
+        if _bank is None:
+            _bank = StimulusBank()
+        return _bank
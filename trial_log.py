@@ -0,0 +1,121 @@
+import os
+import sys
+import json
+from time import monotonic
+
+# Fields of the session header, in the order they appear in the compacted JSON file
+session_fields = ['name', 'age', 'gender', 'email', 'phone']
+
+
+class TrialLog:
+    """
+    Append-only JSON Lines log of an experiment session.
+
+    The first line is the session header, every following line one completed trial.
+    Each append is a single short write flushed to the operating system, so a crash of
+    the experiment loses nothing. The file is fsynced at most every sync_interval seconds,
+    so a power cut loses at most that much. compact() turns a log into the usual
+    user_data JSON file and read_log() rebuilds a session from a partial one.
+    """
+    def __init__(self, path, session, sync_interval=5.0):
+        self.path = path
+        self.sync_interval = sync_interval
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.file = open(path, 'w', encoding='utf-8')
+        self._write({'type': 'session', **{field: session.get(field) for field in session_fields}})
+        self.sync()
+
+    def append(self, index, response):
+        """
+        Log a trial's response record. index identifies the trial; if the same trial is
+        logged again (a repeat), the last record wins when the log is read back.
+        """
+        self._write({'type': 'trial', 'index': index, 'response': response})
+        if monotonic() - self.last_sync >= self.sync_interval:
+            self.sync()
+
+    def sync(self):
+        """
+        Force everything written so far onto the disk.
+        """
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.last_sync = monotonic()
+
+    def close(self):
+        if not self.file.closed:
+            self.sync()
+            self.file.close()
+
+    def _write(self, record):
+        self.file.write(json.dumps(record, separators=(',', ':')) + '\n')
+        self.file.flush()
+
+
+def read_log(path):
+    """
+    Rebuild a session from a trial log, which may have been cut short by a crash.
+    A torn last line is ignored.
+
+    Returns a dictionary in the user_data JSON layout (responses sorted by frequency).
+    """
+    session = {}
+    responses = {}
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # Only the last line can be incomplete; everything before it was flushed whole
+                break
+            if record.get('type') == 'session':
+                session = record
+            elif record.get('type') == 'trial':
+                responses[record['index']] = record['response']
+
+    organized_data = sorted((responses[index] for index in sorted(responses)), key=lambda x: x['frequency'])
+    return {
+        'name': session.get('name'),
+        'age': session.get('age'),
+        'gender': session.get('gender'),
+        'email': session.get('email'),
+        'phone': session.get('phone'),
+        'responses': organized_data
+    }
+
+def compact(log_path, json_path=None, remove_log=True):
+    """
+    Write the session in a trial log as a user_data JSON file (indent=4, as the experiment
+    always saved it) and optionally delete the log. The JSON file is replaced atomically.
+
+    Parameters:
+    log_path: Path of the .jsonl trial log.
+    json_path: Output path (defaults to the log path with a .json extension).
+    remove_log: Delete the log once the JSON file is safely written.
+
+    Returns the path of the JSON file.
+    """
+    if json_path is None:
+        json_path = os.path.splitext(log_path)[0] + '.json'
+    data = read_log(log_path)
+
+    temp_path = f'{json_path}.{os.getpid()}.tmp'
+    with open(temp_path, 'w') as f:
+        json.dump(data, f, indent=4)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, json_path)
+
+    if remove_log:
+        os.remove(log_path)
+    return json_path
+
+if __name__ == '__main__':
+    # Recover sessions left behind by a crash: compact every log given (or every log in raw_data)
+    paths = sys.argv[1:]
+    if not paths:
+        raw_data_dir = os.path.join(os.path.dirname(__file__), 'raw_data')
+        paths = [os.path.join(raw_data_dir, name) for name in sorted(os.listdir(raw_data_dir)) if name.endswith('.jsonl')]
+    for log_path in paths:
+        json_path = compact(log_path)
+        print(f"Recovered {os.path.basename(log_path)} to {os.path.basename(json_path)}")
@@ -0,0 +1,89 @@
+from time import perf_counter_ns
+from PyQt5.QtCore import QObject, QTimer, Qt
+
+
+class TrialScheduler(QObject):
+    """
+    Runs the stages of a trial at absolute deadlines on the time.perf_counter_ns clock.
+
+    Each stage is scheduled against a fixed anchor (the trial epoch, the end of the sound
+    or a key press), never against whenever the previous callback happened to run, so
+    event-loop lag does not accumulate from stage to stage. Every stage that fires is
+    recorded with its scheduled and actual time.
+    """
+    def __init__(self, parent=None, tolerance_ms=10):
+        super().__init__(parent)
+        self.tolerance_ns = tolerance_ms * 1000000  # Lateness beyond this marks the trial's timing as off
+        self.epoch_ns = None
+        self.timeline = []  # (stage, scheduled_ns, fired_ns) for the current trial
+        self._timers = []
+
+    def start_trial(self, epoch_ns=None):
+        """
+        Start a new trial timeline at epoch_ns (now if not given), cancelling pending stages.
+        """
+        self.cancel()
+        self.epoch_ns = perf_counter_ns() if epoch_ns is None else epoch_ns
+        self.timeline = []
+        return self.epoch_ns
+
+    def schedule(self, stage, delay_ms, callback, anchor_ns=None):
+        """
+        Run callback() delay_ms after anchor_ns (the trial epoch if not given).
+        """
+        if anchor_ns is None:
+            anchor_ns = self.epoch_ns
+        self._arm(stage, anchor_ns + int(delay_ms * 1000000), callback)
+
+    def cancel(self):
+        """
+        Drop every stage that has not fired yet.
+        """
+        for timer in self._timers:
+            timer.stop()
+            timer.deleteLater()
+        self._timers = []
+
+    def record(self):
+        """
+        Return the current trial's timeline as compact integers: a list of
+        [stage, scheduled_us, fired_us] relative to the trial epoch.
+        """
+        return [
+            [stage, (scheduled_ns - self.epoch_ns) // 1000, (fired_ns - self.epoch_ns) // 1000]
+            for stage, scheduled_ns, fired_ns in self.timeline
+        ]
+
+    def max_lateness_us(self):
+        """
+        Return how late the latest-firing stage of the current trial was, in microseconds.
+        """
+        return max((fired_ns - scheduled_ns for _, scheduled_ns, fired_ns in self.timeline), default=0) // 1000
+
+    def on_time(self):
+        """
+        Return True if every stage of the current trial fired within the tolerance.
+        """
+        return self.max_lateness_us() * 1000 <= self.tolerance_ns
+
+    def _arm(self, stage, deadline_ns, callback):
+        timer = QTimer(self)
+        timer.setSingleShot(True)
+        timer.setTimerType(Qt.PreciseTimer)
+        timer.timeout.connect(lambda: self._fire(timer, stage, deadline_ns, callback))
+        self._timers.append(timer)
+        # Round up so the timer does not fire before the deadline
+        timer.start(max(0, -(-(deadline_ns - perf_counter_ns()) // 1000000)))
+
+    def _fire(self, timer, stage, deadline_ns, callback):
+        if timer not in self._timers:
+            return
+        self._timers.remove(timer)
+        timer.deleteLater()
+        fired_ns = perf_counter_ns()
+        if fired_ns < deadline_ns:
+            # Woke up early: wait out the rest
+            self._arm(stage, deadline_ns, callback)
+            return
+        self.timeline.append((stage, deadline_ns, fired_ns))
+        callback()